@@ -7,7 +7,7 @@ import time
 import uhashlib
 import ubinascii
 from lib.Logger import debug, info, warn
-from lib.CacheManager import cache
+from lib.CacheManager import cache, PRIORITY_HIGH
 from lib.Settings import get_settings, DEFAULT_TOKEN_EXPIRE_DAYS
 from lib.microdot import Response
 
@@ -16,6 +16,11 @@ cache.register('runtime:token_secret', ctype='const',
                initial=ubinascii.hexlify(os.urandom(16)).decode('utf-8'))
 info("Token签名密钥已生成（128位随机）", "Security")
 
+# 已验证 Token 缓存 {token: (user_id, expire_time, secret)}，命中时跳过签名哈希
+# 仅缓存验证通过的 Token；条目记录验证时使用的密钥，密钥更换后整体作废
+TOKEN_CACHE_SIZE = 16
+cache.register('auth:tokens', ctype='dict', max_size=TOKEN_CACHE_SIZE, priority=PRIORITY_HIGH)
+
 
 def hash_password(password):
     """使用SHA256对密码进行哈希处理（带salt）"""
@@ -73,12 +78,23 @@ def generate_token(user_id):
 
 def verify_token(token):
     """
-    验证Token有效性
+    验证Token有效性（验证通过的Token进入缓存，重复请求只需查表并检查过期时间）
     返回: (是否有效, user_id或None, 错误消息)
     """
     if not token:
         return False, None, "未提供Token"
     
+    secret = _get_token_secret()
+    hit = cache.get('auth:tokens', token)
+    if hit is not None:
+        if hit[2] is secret:
+            if int(time.time()) > hit[1]:
+                cache.invalidate('auth:tokens', token)
+                return False, None, "Token已过期，请重新登录"
+            return True, hit[0], None
+        # 签名密钥已更换，之前验证通过的 Token 全部作废
+        cache.invalidate('auth:tokens')
+    
     try:
         parts = token.split(':')
         if len(parts) != 3:
@@ -94,7 +110,6 @@ def verify_token(token):
             return False, None, "Token已过期，请重新登录"
         
         # 验证签名
-        secret = _get_token_secret()
         sign_data = f"{user_id}:{expire_time}:{secret}"
         h = uhashlib.sha256(sign_data.encode('utf-8'))
         expected_signature = ubinascii.hexlify(h.digest()).decode('utf-8')
@@ -102,6 +117,7 @@ def verify_token(token):
         if provided_signature != expected_signature:
             return False, None, "Token签名无效"
         
+        cache.put('auth:tokens', token, (user_id, expire_time, secret))
         return True, user_id, None
     except Exception as e:
         debug(f"Token验证失败: {e}", "Auth")
@@ -116,14 +132,25 @@ def extract_token(request):
     return token
 
 
+def auth_context(request):
+    """
+    请求级鉴权上下文：同一请求内只提取并验证一次Token，结果保存在 request.g['auth']，
+    路由包装、鉴权装饰器与处理函数共享，避免重复的签名哈希
+    返回: (是否有效, user_id或None, 错误消息)
+    """
+    ctx = request.g.get('auth')
+    if ctx is None:
+        ctx = verify_token(extract_token(request))
+        request.g['auth'] = ctx
+    return ctx
+
+
 def check_token(request):
     """
     从请求中验证Token（支持Header和请求体两种方式）
     返回: (是否有效, user_id或None, 错误响应或None)
     """
-    token = extract_token(request)
-    
-    valid, user_id, err_msg = verify_token(token)
+    valid, user_id, err_msg = auth_context(request)
     if not valid:
         return False, None, Response(json.dumps({"error": err_msg}), 401, {'Content-Type': 'application/json'})
     
@@ -3,14 +3,226 @@
 统一管理所有后端内存缓存，支持 TTL、max_size 策略和统计监控。
 
 缓存槽类型：
-- dict: 内部字典，store(name) 返回可变引用
+- dict: 内部字典，store(name) 返回可变引用；get/put 按键读写
+        设置 max_size 或 ttl 时使用 LRUDict：按 LRU 淘汰，ttl 按条目分别计时
 - list: 内部列表，store(name) 返回可变引用
 - value: 单值（int/str/dict/None），get_val/set_val 读写
 - const: 只读常量，get_val 读取，不可修改
+
+内存核算：每个槽在写入时估算字节数（set_val/put），可淘汰缓存的总量超过全局预算
+（堆总量 gc.mem_free()+gc.mem_alloc() 的 BUDGET_RATIO）时，按优先级从低到高淘汰，
+同优先级中先淘汰占用大的槽，LRUDict 槽按条目从最久未使用开始淘汰
+
+表依赖：注册时以 depends 声明所依赖的数据表，JsonlDB 写入后调用 notify 发布变更，
+依赖该表的槽（或槽中对应条目）自动失效，业务代码无需手动失效
+
+加载器与 SWR：value 槽可在注册时提供 loader（无参异步函数），fetch(name) 未命中时调用它计算并写入，
+并发未命中合并为一次加载（单飞）；
+同时设置 swr=True 时，TTL 过期的旧值继续返回，由一个后台任务重新计算后替换，
+请求耗时始终为命中耗时（表变更导致的失效仍同步重算，保证写入后读到新数据）
 """
 
 import time
 import gc
+import uasyncio as asyncio
+from array import array
+from lib.Logger import warn
+
+# 淘汰优先级：数值越小越先淘汰（重建成本越低）
+PRIORITY_LOW = 0        # 读一次文件即可重建（页面缓存、静态文件）
+PRIORITY_NORMAL = 1     # 需要扫描数据表重建（统计、记录缓存）
+PRIORITY_HIGH = 2       # 每个请求都依赖或重建代价大（设置、角色、行偏移索引）
+PRIORITY_PINNED = 3     # 运行状态而非缓存（聊天室等），仅 flush_all 紧急释放
+
+# 可淘汰缓存的全局预算占堆总量的比例
+BUDGET_RATIO = 0.25
+
+# LRUDict 链表节点字段
+_PREV = 0
+_NEXT = 1
+_KEY = 2
+_VAL = 3
+_EXP = 4    # 过期时间戳，0 表示不过期
+_SIZE = 5   # 条目估算字节数
+
+# lookup 的返回标记
+_MISS = object()
+_EXPIRED = object()
+
+
+def estimate_size(obj, depth=0):
+    """粗略估算对象占用的堆字节数（对象头与容器槽位按近似值计），用于缓存预算核算"""
+    if obj is None or obj is True or obj is False:
+        return 0
+    t = type(obj)
+    if t is str or t is bytes or t is bytearray:
+        return len(obj) + 16
+    if t is int or t is float:
+        return 8
+    if t is array:
+        return len(obj) * 4 + 16
+    if t is LRUDict:
+        return obj.bytes
+    if depth > 4:
+        return 32
+    if t is dict:
+        n = 32
+        for k, v in obj.items():
+            n += 16 + estimate_size(k, depth + 1) + estimate_size(v, depth + 1)
+        return n
+    if t is list or t is tuple:
+        n = 16
+        for v in obj:
+            n += 8 + estimate_size(v, depth + 1)
+        return n
+    return 32
+
+
+class LRUDict:
+    """
+    O(1) LRU 字典，支持按条目 TTL
+    普通 dict 存放链表节点 {key: [prev, next, key, value, expire]}，双向循环链表维护访问顺序，
+    哨兵之后为最久未使用；查找、移到最近使用端、淘汰均为 O(1)
+    （MicroPython 的 OrderedDict 按线性查找，删除时还要搬移后续条目）
+    迭代顺序为最久未使用 -> 最近使用；下标读写与 lookup/set 相同，会更新访问顺序
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl      # 条目默认存活秒数，None 表示不过期
+        self.bytes = 0      # 全部条目的估算字节数
+        self._map = {}
+        root = [None, None, None, None, 0, 0]
+        root[_PREV] = root
+        root[_NEXT] = root
+        self._root = root
+
+    def _unlink(self, node):
+        node[_PREV][_NEXT] = node[_NEXT]
+        node[_NEXT][_PREV] = node[_PREV]
+
+    def _drop(self, node):
+        self._unlink(node)
+        del self._map[node[_KEY]]
+        self.bytes -= node[_SIZE]
+
+    def _append(self, node):
+        root = self._root
+        last = root[_PREV]
+        node[_PREV] = last
+        node[_NEXT] = root
+        last[_NEXT] = node
+        root[_PREV] = node
+
+    def _live(self, key):
+        """返回未过期的节点；已过期的条目顺带删除"""
+        node = self._map.get(key)
+        if node is not None and node[_EXP] and time.time() > node[_EXP]:
+            self._drop(node)
+            return _EXPIRED
+        return node
+
+    def lookup(self, key):
+        """读取条目并标记为最近使用；不存在返回 _MISS，已过期（同时删除）返回 _EXPIRED"""
+        node = self._live(key)
+        if node is None:
+            return _MISS
+        if node is _EXPIRED:
+            return node
+        if node is not self._root[_PREV]:
+            self._unlink(node)
+            self._append(node)
+        return node[_VAL]
+
+    def set(self, key, value, ttl=None):
+        """写入条目并标记为最近使用；ttl 缺省时使用默认存活时间"""
+        if ttl is None:
+            ttl = self.ttl
+        expire = time.time() + ttl if ttl else 0
+        size = 64 + estimate_size(key) + estimate_size(value)
+        node = self._map.get(key)
+        if node is None:
+            node = [None, None, key, value, expire, size]
+            self._map[key] = node
+        else:
+            self.bytes -= node[_SIZE]
+            node[_VAL] = value
+            node[_EXP] = expire
+            node[_SIZE] = size
+            self._unlink(node)
+        self.bytes += size
+        self._append(node)
+
+    def popitem(self):
+        """淘汰并返回最久未使用的条目 (key, value)"""
+        node = self._root[_NEXT]
+        if node is self._root:
+            raise KeyError('popitem(): dictionary is empty')
+        self._drop(node)
+        return node[_KEY], node[_VAL]
+
+    def pop(self, key, *default):
+        node = self._map.get(key)
+        if node is None:
+            if default:
+                return default[0]
+            raise KeyError(key)
+        self._drop(node)
+        return node[_VAL]
+
+    def clear(self):
+        self.bytes = 0
+        self._map.clear()
+        self._root[_PREV] = self._root
+        self._root[_NEXT] = self._root
+
+    def get(self, key, default=None):
+        value = self.lookup(key)
+        return default if value is _MISS or value is _EXPIRED else value
+
+    def __getitem__(self, key):
+        value = self.lookup(key)
+        if value is _MISS or value is _EXPIRED:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def __delitem__(self, key):
+        self.pop(key)
+
+    def __contains__(self, key):
+        node = self._live(key)
+        return node is not None and node is not _EXPIRED
+
+    def __len__(self):
+        return len(self._map)
+
+    def __iter__(self):
+        node = self._root[_NEXT]
+        while node is not self._root:
+            nxt = node[_NEXT]
+            yield node[_KEY]
+            node = nxt
+
+    def keys(self):
+        return list(self)
+
+    def values(self):
+        return [self._map[k][_VAL] for k in self]
+
+    def items(self):
+        return [(k, self._map[k][_VAL]) for k in self]
+
+
+class _Flight:
+    """进行中的一次加载：首个未命中者计算，并发未命中者 await event 后读取同一结果"""
+
+    def __init__(self, gen):
+        self.gen = gen
+        self.event = asyncio.Event()
+        self.value = None
+        self.error = None
 
 
 class CacheManager:
@@ -18,21 +230,35 @@ class CacheManager:
 
     def __init__(self):
         self._data = {}    # {name: actual_data}
-        self._cfg = {}     # {name: {type, ttl, max_size, ts, hits, misses}}
+        self._cfg = {}     # {name: {type, ttl, max_size, priority, bytes, ts, hits, misses, ...}}
+        self._budget = None
+        self._deps = {}    # {table: [(name, 条件), ...]}，由 register(depends=...) 建立
 
-    def register(self, name, ctype='dict', ttl=None, max_size=None, initial=None):
+    def register(self, name, ctype='dict', ttl=None, max_size=None, initial=None,
+                 priority=PRIORITY_NORMAL, depends=None, loader=None, swr=False):
         """
         注册缓存槽
 
         参数：
         - name: 缓存名称（唯一标识）
         - ctype: 类型 - 'dict'|'list'|'value'|'const'
-        - ttl: 过期时间（秒），None=永不过期
-        - max_size: 最大条目数（仅 dict），超限 FIFO 淘汰
+        - ttl: 过期时间（秒），None=永不过期；dict 槽按条目分别计时，其余类型整槽过期
+        - max_size: 最大条目数（仅 dict），put 时自动淘汰最久未使用条目（LRU）
         - initial: 初始值（dict/list 默认空容器，value/const 默认 None）
+        - priority: 内存预算超限时的淘汰优先级（PRIORITY_*），数值越小越先淘汰
+        - depends: 依赖的数据表（表名为 JsonlDB 文件名，如 'poems'），表变更时自动失效：
+            'poems' 或 ('poems', 'activities')：该表任何变更都失效整个槽
+            {'poems': match}：match(old, new) 为真时才失效，old/new 为变更前后的记录
+                              （新增时 old 为 None，删除时 new 为 None），用于限定键范围
+            {'members': 'id'}：dict 槽以记录的该字段为键，只失效变更记录对应的条目
+        - loader: value 槽的加载函数（无参 async 函数，返回要缓存的值），供 fetch 使用
+        - swr: 过期后先返回旧值，后台调用 loader 刷新（stale-while-revalidate，需同时提供 loader 与 ttl）
         """
         if ctype == 'dict':
-            self._data[name] = initial if initial is not None else {}
+            if initial is None:
+                # 有容量上限或存活时间的字典使用 LRUDict，维护访问顺序与条目过期时间
+                initial = LRUDict(ttl) if (max_size or ttl) else {}
+            self._data[name] = initial
         elif ctype == 'list':
             self._data[name] = initial if initial is not None else []
         elif ctype in ('value', 'const'):
@@ -41,11 +267,27 @@ class CacheManager:
             'type': ctype,
             'ttl': ttl,
             'max_size': max_size,
+            'priority': priority,
+            # value/const 槽写入时估算的字节数（dict/list 槽按内容计算）
+            'bytes': estimate_size(initial) if ctype in ('value', 'const') else 0,
             'ts': time.time(),
             'hits': 0,
             'misses': 0,
-            'expires': 0
+            'expires': 0,
+            'evicts': 0,
+            'loader': loader,
+            'swr': swr,
+            'gen': 0,           # 写入/清除计数，用于丢弃基于旧数据算出的加载结果
+            'flight': None,     # 进行中的加载（_Flight），并发未命中共享
+            'coalesced': 0      # 等待进行中加载而未重复计算的次数
         }
+        if depends:
+            if isinstance(depends, str):
+                depends = (depends,)
+            if not isinstance(depends, dict):
+                depends = {t: None for t in depends}
+            for table, cond in depends.items():
+                self._deps.setdefault(table, []).append((name, cond))
 
     def store(self, name):
         """
@@ -57,8 +299,9 @@ class CacheManager:
         cfg = self._cfg.get(name)
         if not cfg:
             return None
-        # TTL 过期检查
-        if cfg['ttl'] and (time.time() - cfg['ts']) > cfg['ttl']:
+        # TTL 过期检查（LRUDict 按条目过期，不整槽清空）
+        if cfg['ttl'] and not isinstance(self._data[name], LRUDict) \
+                and (time.time() - cfg['ts']) > cfg['ttl']:
             self._clear_slot(name)
             cfg['misses'] += 1
             cfg['expires'] += 1
@@ -66,10 +309,15 @@ class CacheManager:
         cfg['hits'] += 1
         return self._data[name]
 
+    def peek(self, name):
+        """获取缓存槽数据的引用，不计命中/未命中、不做 TTL 检查（供缓存自身的维护逻辑使用）"""
+        return self._data.get(name)
+
     def get_val(self, name):
         """
         获取 value/const 类型缓存的当前值
-        若 TTL 过期（非 const）则清除并返回 None（记录为 expire）
+        若 TTL 过期（非 const）则清除并返回 None（记录为 expire）；
+        swr 槽过期时返回旧值并启动后台刷新
         返回 None 可能是：缓存未注册、TTL 过期、或存储值本身为 None
         """
         cfg = self._cfg.get(name)
@@ -77,6 +325,10 @@ class CacheManager:
             return None
         # const 类型不检查 TTL
         if cfg['type'] != 'const' and cfg['ttl'] and (time.time() - cfg['ts']) > cfg['ttl']:
+            if cfg['swr'] and self._data[name] is not None:
+                self._refresh(name)
+                cfg['hits'] += 1
+                return self._data[name]
             self._clear_slot(name)
             cfg['misses'] += 1
             cfg['expires'] += 1
@@ -89,9 +341,115 @@ class CacheManager:
         cfg = self._cfg.get(name)
         if cfg and cfg['type'] != 'const':
             self._data[name] = value
+            cfg['bytes'] = estimate_size(value)
+            cfg['gen'] += 1
+            cfg['flight'] = None
             # 非 None 时更新时间戳（用于 TTL 计算）
             if value is not None:
                 cfg['ts'] = time.time()
+                self._fit(name)
+
+    async def fetch(self, name):
+        """
+        读取带 loader 的 value 槽：命中（含 swr 槽的过期旧值）直接返回，否则调用 loader 计算并写入
+        单飞：同一槽同时只有一个加载在运行，并发未命中的协程等待同一结果，不重复扫描；
+        计算期间槽被写入或失效时，结果只返回不缓存，之后的未命中重新加载
+        """
+        cfg = self._cfg[name]
+        if self._data[name] is not None:
+            value = self.get_val(name)
+            if value is not None:
+                return value
+        else:
+            cfg['misses'] += 1
+        flight = cfg['flight']
+        if flight is None:
+            flight = self._begin(name)
+            await self._load(name, flight)
+        else:
+            cfg['coalesced'] += 1
+            await flight.event.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    def _begin(self, name):
+        """内部：登记一次加载（在让出事件循环前记录代次，之后的写入/失效会使结果作废）"""
+        cfg = self._cfg[name]
+        flight = cfg['flight'] = _Flight(cfg['gen'])
+        return flight
+
+    async def _load(self, name, flight):
+        """内部：运行 loader，写入缓存并唤醒等待者；异常记录在 flight 中由等待者各自抛出"""
+        cfg = self._cfg[name]
+        try:
+            flight.value = await cfg['loader']()
+            if flight.gen == cfg['gen']:
+                self.set_val(name, flight.value)
+        except Exception as e:
+            flight.error = e
+            warn(f"缓存 {name} 加载失败: {e}", "Cache")
+        finally:
+            if cfg['flight'] is flight:
+                cfg['flight'] = None
+            flight.event.set()
+
+    def loaders(self):
+        """带 loader 的槽名列表，按优先级从高到低排列（启动预热顺序）"""
+        names = [n for n, c in self._cfg.items() if c['loader'] is not None]
+        names.sort(key=lambda n: self._cfg[n]['priority'], reverse=True)
+        return names
+
+    def _refresh(self, name):
+        """内部：为过期的 swr 槽启动后台刷新（已有加载在运行时不重复启动），失败时保留旧值，下次读取再重试"""
+        cfg = self._cfg[name]
+        if cfg['flight'] is not None:
+            return
+        cfg['expires'] += 1
+        asyncio.create_task(self._load(name, self._begin(name)))
+
+    def get(self, name, key, default=None):
+        """
+        读取 dict 类型缓存中的单个条目（按键统计命中/未命中）
+        LRUDict 槽：命中时将条目移到最近使用端，条目过期则删除（记录为 expire）
+        """
+        cfg = self._cfg.get(name)
+        if not cfg or cfg['type'] != 'dict':
+            return default
+        d = self._data[name]
+        if isinstance(d, LRUDict):
+            value = d.lookup(key)
+            if value is _MISS or value is _EXPIRED:
+                if value is _EXPIRED:
+                    cfg['expires'] += 1
+                cfg['misses'] += 1
+                return default
+            cfg['hits'] += 1
+            return value
+        if cfg['ttl'] and (time.time() - cfg['ts']) > cfg['ttl']:
+            self._clear_slot(name)
+            cfg['expires'] += 1
+        if key not in d:
+            cfg['misses'] += 1
+            return default
+        cfg['hits'] += 1
+        return d[key]
+
+    def put(self, name, key, value, ttl=None):
+        """
+        写入 dict 类型缓存的单个条目，超出 max_size 时自动淘汰最久未使用条目
+        ttl: 该条目的存活秒数，缺省使用注册时的 ttl（仅 LRUDict 槽）
+        """
+        cfg = self._cfg.get(name)
+        if not cfg or cfg['type'] != 'dict':
+            return
+        d = self._data[name]
+        if isinstance(d, LRUDict):
+            d.set(key, value, ttl)
+        else:
+            d[key] = value
+        self.enforce_max_size(name)
+        self._fit(name)
 
     def invalidate(self, name, key=None):
         """
@@ -107,15 +465,124 @@ class CacheManager:
         else:
             self._clear_slot(name)
 
+    def notify(self, table, old=None, new=None):
+        """
+        数据表变更通知（JsonlDB 写入后调用），失效依赖该表的缓存
+        old/new 为变更前后的记录；两者均为 None 表示整表变更（如导入），依赖方全部失效
+        """
+        deps = self._deps.get(table)
+        if not deps:
+            return
+        whole = old is None and new is None
+        for name, cond in deps:
+            if cond is None or whole:
+                self.invalidate(name)
+                continue
+            try:
+                if isinstance(cond, str):
+                    for r in (old, new):
+                        if r is not None and cond in r:
+                            self.invalidate(name, key=r[cond])
+                elif cond(old, new):
+                    self.invalidate(name)
+            except Exception as e:
+                # 条件判断失败（如记录字段类型异常）：宁可多失效，不能中断写入或漏掉其余依赖
+                warn(f"缓存 {name} 依赖判断失败，整槽失效: {e}", "Cache")
+                self.invalidate(name)
+
     def enforce_max_size(self, name):
-        """强制执行 dict 类型的 max_size 限制（FIFO 淘汰最早条目）"""
+        """强制执行 dict 类型的 max_size 限制（淘汰最久未使用的条目，put 时自动调用）"""
         cfg = self._cfg.get(name)
         if not cfg or not cfg['max_size'] or cfg['type'] != 'dict':
             return
         d = self._data[name]
         while len(d) > cfg['max_size']:
-            first_key = next(iter(d))
-            del d[first_key]
+            d.popitem()
+            cfg['evicts'] += 1
+
+    def budget(self):
+        """可淘汰缓存的全局字节预算（首次调用时按堆总量计算）"""
+        if self._budget is None:
+            try:
+                total = gc.mem_free() + gc.mem_alloc()
+            except AttributeError:
+                total = 0
+            self._budget = int(total * BUDGET_RATIO) or None
+        return self._budget
+
+    def slot_bytes(self, name):
+        """单个槽的估算字节数"""
+        cfg = self._cfg[name]
+        if cfg['type'] in ('value', 'const'):
+            return cfg['bytes']
+        return estimate_size(self._data[name])
+
+    def _charged(self, name):
+        """
+        是否计入全局预算：非 PINNED 的 value 槽与 LRUDict 槽
+        预算核算与淘汰共用此判断，未计入预算的槽（const、普通 dict/list）也不会被 shrink 淘汰
+        """
+        cfg = self._cfg[name]
+        if cfg['priority'] >= PRIORITY_PINNED:
+            return False
+        return cfg['type'] == 'value' or isinstance(self._data[name], LRUDict)
+
+    def total_bytes(self):
+        """计入预算的缓存槽（见 _charged）的估算总字节数"""
+        n = 0
+        for name, cfg in self._cfg.items():
+            if not self._charged(name):
+                continue
+            if cfg['type'] == 'value':
+                n += cfg['bytes']
+            else:
+                n += self._data[name].bytes
+        return n
+
+    def _fit(self, name):
+        """写入后检查全局预算，超出时淘汰其他槽（刚写入的槽最后考虑）"""
+        budget = self.budget()
+        if budget:
+            over = self.total_bytes() - budget
+            if over > 0:
+                self.shrink(over, exclude=name)
+
+    def shrink(self, nbytes, exclude=None):
+        """
+        按优先级从低到高淘汰缓存，直到估算释放 nbytes 字节；返回估算释放的字节数
+        同优先级中先处理占用大的槽；LRUDict 槽逐条淘汰最久未使用的条目，其余槽整体清除
+        只淘汰计入预算的槽（见 _charged）；exclude 槽仅在其他槽都不够时才淘汰
+        """
+        freed = 0
+        for prio in range(PRIORITY_PINNED):
+            names = [n for n, c in self._cfg.items()
+                     if c['priority'] == prio and n != exclude and self._charged(n)]
+            names.sort(key=self.slot_bytes, reverse=True)
+            if exclude and exclude in self._cfg and self._cfg[exclude]['priority'] == prio \
+                    and self._charged(exclude):
+                names.append(exclude)
+            for name in names:
+                freed += self._evict(name, nbytes - freed)
+                if freed >= nbytes:
+                    return freed
+        return freed
+
+    def _evict(self, name, nbytes):
+        """从单个槽释放至少 nbytes 字节（能释放多少算多少），返回估算释放量"""
+        cfg = self._cfg[name]
+        d = self._data[name]
+        if isinstance(d, LRUDict):
+            before = d.bytes
+            while d and before - d.bytes < nbytes:
+                d.popitem()
+                cfg['evicts'] += 1
+            return before - d.bytes
+        size = self.slot_bytes(name)
+        if size and d:
+            self._clear_slot(name)
+            cfg['evicts'] += 1
+            return size
+        return 0
 
     def stats(self):
         """获取所有缓存的统计信息，用于监控接口"""
@@ -132,11 +599,16 @@ class CacheManager:
             result[name] = {
                 'type': cfg['type'],
                 'size': size,
+                'bytes': self.slot_bytes(name),
+                'priority': cfg['priority'],
                 'ttl': cfg['ttl'],
+                'swr': cfg['swr'],
                 'max_size': cfg['max_size'],
                 'hits': cfg['hits'],
                 'misses': cfg['misses'],
                 'expires': cfg['expires'],
+                'evicts': cfg['evicts'],
+                'coalesced': cfg['coalesced'],
                 'hit_rate': round(cfg['hits'] / total * 100) if total > 0 else 0
             }
         return result
@@ -157,6 +629,9 @@ class CacheManager:
             self._data[name].clear()
         elif cfg['type'] == 'value':
             self._data[name] = None
+            cfg['bytes'] = 0
+            cfg['gen'] += 1
+            cfg['flight'] = None
         # const 类型不清除
         cfg['ts'] = time.time()
 
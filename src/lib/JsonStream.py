@@ -0,0 +1,243 @@
+# 增量 JSON 流解析器
+# 按块消费请求体，逐条产出记录，内存占用只与单条记录大小有关，与请求体总长度无关
+# 支持三种格式：
+#   [rec, rec, ...]                 顶层数组
+#   {"data": [rec, rec, ...], ...}  包装对象中的数组（键名可指定，其余键被跳过）
+#   rec\nrec\n...                   NDJSON（每行一条，需显式指定）
+
+import json
+
+# 单条记录的最大字节数，超出视为格式错误，防止畸形请求体耗尽内存
+MAX_RECORD = 16384
+
+# 解析状态
+_START = 0      # 等待顶层值
+_WRAPPER = 1    # 在包装对象内查找目标键
+_ARRAY = 2      # 在目标数组内逐个切分元素
+_AFTER = 3      # 目标数组已结束，跳过包装对象剩余部分
+_DONE = 4       # 顶层值已结束
+
+
+class JsonStreamParser:
+    """
+    增量解析器：feed(chunk) 返回该块中完整解析出的记录列表，全部喂完后调用 close() 校验结尾
+
+    只跟踪字符串与括号层级来切分数组元素，元素本身交给 json.loads 解析；
+    字符串内部用 find 跳到下一个引号，正文较长的记录无需逐字节遍历
+    """
+
+    def __init__(self, key='data', ndjson=False, max_record=MAX_RECORD):
+        self.key = key.encode() if key else None
+        self.ndjson = ndjson
+        self.max_record = max_record
+        self.count = 0          # 已产出的记录数
+        self.found = False      # 是否找到目标数组（NDJSON 恒为 True）
+        self._buf = b''
+        self._pos = 0           # 扫描位置（可能越过缓冲末尾 1 字节：转义符后的字符尚未到达）
+        self._start = -1        # 当前元素起点，-1 表示不在元素内
+        self._depth = 0
+        self._arr = 0           # 目标数组所在层级
+        self._comma = False     # 目标数组中刚读到逗号（下一个必须是元素）
+        self._state = _START
+        self._in_str = False
+        self._key_start = -1    # 包装对象当前键名的起点
+        self._expect_key = False
+        self._pending_key = None
+
+    def feed(self, chunk):
+        """喂入一块字节，返回本次新解析出的完整记录"""
+        self._buf = self._buf + chunk if self._buf else chunk
+        out = []
+        if self.ndjson:
+            self._scan_lines(out)
+        else:
+            self._scan(out)
+        self._trim()
+        return out
+
+    def close(self):
+        """请求体结束：解析 NDJSON 最后一行，校验 JSON 结构完整；返回剩余记录"""
+        out = []
+        if self.ndjson:
+            line = self._buf[self._pos:].strip()
+            if line:
+                out.append(self._load(line))
+            self._buf = b''
+            self.found = True
+            return out
+        if self._state == _START:
+            raise ValueError('empty body')
+        if self._state != _DONE or self._in_str:
+            raise ValueError('unexpected end of JSON')
+        return out
+
+    def _load(self, raw):
+        self.count += 1
+        return json.loads(raw)
+
+    def _scan_lines(self, out):
+        buf = self._buf
+        i = self._pos
+        while True:
+            j = buf.find(b'\n', i)
+            if j < 0:
+                break
+            line = buf[i:j].strip()
+            if line:
+                out.append(self._load(line))
+            i = j + 1
+        self._pos = i
+        if len(buf) - i > self.max_record:
+            raise ValueError('record too large')
+
+    def _scan(self, out):
+        buf = self._buf
+        n = len(buf)
+        i = self._pos
+        depth = self._depth
+        state = self._state
+        start = self._start
+        while i < n:
+            if self._in_str:
+                j = buf.find(b'"', i)
+                b = buf.find(b'\\', i, n if j < 0 else j)
+                if j < 0 and b < 0:
+                    i = n
+                    break
+                if b >= 0:
+                    # 跳过转义符及其后一个字符（\" 不结束字符串）
+                    i = b + 2
+                    continue
+                self._in_str = False
+                if self._key_start >= 0:
+                    self._pending_key = buf[self._key_start:j]
+                    self._key_start = -1
+                i = j + 1
+                continue
+
+            c = buf[i]
+            i += 1
+            if c <= 0x20:
+                continue
+            if state == _DONE:
+                raise ValueError('trailing data after JSON')
+            if state == _ARRAY and depth == self._arr:
+                # 数组层级：逗号/右括号结束当前元素，其余字符开始新元素
+                if c == 0x2c or c == 0x5d:
+                    if start >= 0:
+                        out.append(self._load(buf[start:i - 1]))
+                        start = -1
+                    elif c == 0x2c or self._comma:
+                        # 空元素：[,1]、[1,,2]、[1,]
+                        raise ValueError('missing array element')
+                    self._comma = c == 0x2c
+                    if c == 0x5d:
+                        depth -= 1
+                        state = _AFTER if depth else _DONE
+                    continue
+                if start < 0:
+                    start = i - 1
+                    self._comma = False
+            if c == 0x22:
+                self._in_str = True
+                if state == _WRAPPER and depth == 1 and self._expect_key:
+                    self._key_start = i
+            elif c == 0x7b or c == 0x5b:
+                depth += 1
+                if state == _START:
+                    if c == 0x5b:
+                        state = _ARRAY
+                        self._arr = 1
+                        self.found = True
+                    else:
+                        state = _WRAPPER
+                        self._expect_key = True
+                elif (state == _WRAPPER and depth == 2 and c == 0x5b
+                      and self._pending_key == self.key):
+                    state = _ARRAY
+                    self._arr = 2
+                    self.found = True
+            elif c == 0x7d or c == 0x5d:
+                depth -= 1
+                if depth < 0:
+                    raise ValueError('unbalanced JSON')
+                if depth == 0:
+                    state = _DONE
+            elif state == _START:
+                raise ValueError('expected JSON array or object')
+            elif state == _WRAPPER and depth == 1:
+                if c == 0x3a:
+                    self._expect_key = False
+                elif c == 0x2c:
+                    self._expect_key = True
+                    self._pending_key = None
+        self._pos = i
+        self._depth = depth
+        self._state = state
+        self._start = start
+        if start >= 0 and n - start > self.max_record:
+            raise ValueError('record too large')
+
+    def _trim(self):
+        """丢弃已处理的字节，只保留未完成的元素或键名"""
+        if self._start >= 0:
+            cut = self._start
+        elif self._key_start >= 0:
+            cut = self._key_start
+        else:
+            cut = min(self._pos, len(self._buf))
+        if not cut:
+            return
+        self._buf = self._buf[cut:]
+        self._pos -= cut
+        if self._start >= 0:
+            self._start -= cut
+        if self._key_start >= 0:
+            self._key_start -= cut
+
+
+class JsonRecordStream:
+    """
+    异步逐条读取记录：包装请求体流（需提供 async read(n)）与 JsonStreamParser
+    用法：
+        records = JsonRecordStream(request.stream)
+        async for rec in records: ...
+        records.count / records.found
+    请求体读完后自动校验结构，格式错误抛出 ValueError，请求体不完整抛出 OSError
+    """
+
+    def __init__(self, stream, key='data', ndjson=False, max_record=MAX_RECORD):
+        self.stream = stream
+        self.parser = JsonStreamParser(key, ndjson, max_record)
+        self._pending = []
+        self._idx = 0
+        self._eof = False
+
+    @property
+    def count(self):
+        return self.parser.count
+
+    @property
+    def found(self):
+        return self.parser.found
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while self._idx >= len(self._pending):
+            if self._eof:
+                raise StopAsyncIteration
+            chunk = await self.stream.read()
+            if chunk:
+                self._pending = self.parser.feed(chunk)
+            else:
+                if getattr(self.stream, 'truncated', False):
+                    raise OSError('request body truncated')
+                self._eof = True
+                self._pending = self.parser.close()
+            self._idx = 0
+        rec = self._pending[self._idx]
+        self._pending[self._idx] = None
+        self._idx += 1
+        return rec
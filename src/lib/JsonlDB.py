@@ -4,8 +4,27 @@
 import json
 import os
 import gc
+import time
+import uasyncio as asyncio
+from array import array
 from lib.Logger import debug, error
-from lib.CacheManager import cache
+from lib.CacheManager import cache, PRIORITY_HIGH
+
+# 单表记录缓存默认容量（按 id 缓存已解析的热点记录）
+RECORD_CACHE_SIZE = 16
+# 原始行键值提取时，值文本的最大扫描长度（字节）
+RAW_VALUE_MAX = 48
+# 块扫描器每次读取的块大小（字节），遇到超长行时按倍数扩大
+SCAN_BLOCK = 2048
+# 异步扫描每处理多少行或多少毫秒主动让出一次事件循环
+YIELD_LINES = 32
+YIELD_MS = 20
+# 异步重写期间表被其他请求修改时的重试次数（之后一次性同步完成）
+AREWRITE_RETRIES = 2
+# ID 序列每次持久化预留的 ID 个数：每分配这么多个 ID 才写一次元数据文件
+ID_BLOCK = 16
+
+_ID_PAT = b'"id":'
 
 
 def file_exists(path):
@@ -16,14 +35,282 @@ def file_exists(path):
         return False
 
 
+def key_pattern(key):
+    """生成 raw_value 使用的字段匹配模式（如 b'"id":'）"""
+    return ('"' + key + '":').encode()
+
+
+def raw_value(buf, pat, start=0, end=None):
+    """
+    从原始 JSON 行（buf[start:end]）中直接提取标量字段的文本值（不解析整行）
+    返回值与 str(record.get(key)).encode() 一致，用于扫描时快速跳过不匹配的行
+    返回 None 表示无法可靠提取（字段缺失、出现多次、含转义或值过长），
+    调用方应回退到 json.loads 解析
+    """
+    if end is None:
+        end = len(buf)
+    i = buf.find(pat, start, end)
+    if i < 0 or buf.find(pat, i + 1, end) >= 0:
+        return None
+    i += len(pat)
+    lim = min(i + RAW_VALUE_MAX, end)
+    while i < lim and buf[i] == 32:
+        i += 1
+    if i < lim and buf[i] == 34:
+        j = buf.find(b'"', i + 1, lim)
+        if j < 0:
+            return None
+        v = buf[i + 1:j]
+        return None if b'\\' in v else v
+    # 非字符串值：截取到下一个 ',' 或 '}'
+    j = buf.find(b',', i, lim)
+    k = buf.find(b'}', i, lim)
+    if j < 0 or (0 <= k < j):
+        j = k
+    if j < 0:
+        return None
+    v = buf[i:j].strip()
+    if v == b'null':
+        return b'None'
+    if v == b'true':
+        return b'True'
+    if v == b'false':
+        return b'False'
+    # 仅接受普通整数/小数，其余（嵌套结构、科学计数法等）交由完整解析
+    if not v or v[:1] in b'[{' or b'e' in v or b'E' in v:
+        return None
+    return v
+
+
+class LineScanner:
+    """
+    按块读取 JSONL 文件并逐行定位（二进制模式）
+    - 每块只产生一次分配，行本身不复制：当前行为 buf[s:e]（已去除首尾空白）
+    - 块尾的不完整行回退到行首重新读取，单行超过块大小时自动扩大读取量
+    - 空白行自动跳过；只有通过过滤的行才需要 line() 生成副本交给 json.loads
+    用法：
+        sc = LineScanner(f)
+        while sc.next():
+            ... sc.raw(pat) / sc.contains(needle) / sc.line() / sc.copy_to(f_out)
+    """
+
+    def __init__(self, f, block=SCAN_BLOCK):
+        self.f = f
+        self.block = block
+        self.buf = b''
+        self.base = 0      # buf[0] 对应的文件偏移
+        self.pos = 0       # 当前行起始的文件偏移
+        self.s = 0         # 当前行内容 [s, e)
+        self.e = 0
+        self._ls = 0       # 当前行在 buf 中的起点（含前导空白）
+        self._le = 0       # 当前行换行符位置（无换行的末行为 len(buf)）
+        self._next = 0
+        self._low = None
+        self._eof = False
+
+    def _fill(self):
+        """从下一行行首开始读取新块"""
+        self.base += self._next
+        self._next = 0
+        self._low = None
+        f = self.f
+        size = self.block
+        while True:
+            f.seek(self.base)
+            data = f.read(size)
+            # 整块都没有换行且未到文件尾：单行超长，扩大读取量重试
+            if len(data) < size or data.find(b'\n') >= 0:
+                break
+            size *= 2
+        self._eof = len(data) < size
+        self.buf = data
+
+    def next(self):
+        """前进到下一条非空行，返回 False 表示已到文件尾"""
+        while True:
+            buf = self.buf
+            i = self._next
+            j = buf.find(b'\n', i)
+            if j < 0:
+                if not self._eof:
+                    self._fill()
+                    continue
+                if i >= len(buf):
+                    return False
+                j = len(buf)
+            self._next = j + 1
+            s = i
+            while s < j and buf[s] in (32, 9, 13):
+                s += 1
+            e = j
+            while e > s and buf[e - 1] in (32, 9, 13):
+                e -= 1
+            if s == e:
+                continue
+            self._ls = i
+            self._le = j
+            self.s = s
+            self.e = e
+            self.pos = self.base + i
+            return True
+
+    def raw(self, pat):
+        """提取当前行的标量字段原始值，见 raw_value"""
+        return raw_value(self.buf, pat, self.s, self.e)
+
+    def contains(self, needle, fold=False):
+        """当前行是否包含 needle（bytes）；fold=True 时按 ASCII 忽略大小写（needle 需为小写）"""
+        buf = self.buf
+        if fold:
+            if self._low is None:
+                self._low = buf.lower()
+            buf = self._low
+        return buf.find(needle, self.s, self.e) >= 0
+
+    def line(self):
+        """当前行内容的副本（bytes），可直接交给 json.loads"""
+        return self.buf[self.s:self.e]
+
+    def copy_to(self, f_out):
+        """将当前行原样写入 f_out（二进制模式），保证以换行结尾"""
+        mv = memoryview(self.buf)
+        if self._le < len(self.buf):
+            f_out.write(mv[self._ls:self._le + 1])
+        else:
+            f_out.write(mv[self._ls:self._le])
+            f_out.write(b'\n')
+
+
+class Pacer:
+    """协作式让出节拍器：每处理 lines 行或连续运行超过 ms 毫秒时 due() 返回 True"""
+
+    def __init__(self, lines=YIELD_LINES, ms=YIELD_MS):
+        self.lines = lines
+        self.ms = ms
+        self.restart()
+
+    def restart(self):
+        self._n = 0
+        self._t = time.ticks_ms()
+
+    def due(self):
+        self._n += 1
+        return self._n >= self.lines or time.ticks_diff(time.ticks_ms(), self._t) >= self.ms
+
+
+async def _paced(steps, pacer):
+    """驱动扫描生成器：每次生成器让出时 await asyncio.sleep(0)，让其他连接得到处理"""
+    for _ in steps:
+        await asyncio.sleep(0)
+        pacer.restart()
+
+
+class AsyncRecordIter:
+    """
+    异步记录迭代器（async for），按 Pacer 节拍让出事件循环
+    让出期间表被重写（版本号变化）时，原文件句柄已失效：重新打开新文件并跳过已读行数继续
+    （更新不改变行序，结果准确；删除或整表导入后，之后的记录可能错位一条）
+    提前结束迭代时应调用 close() 关闭文件
+    """
+
+    def __init__(self, db, pacer=None):
+        self._db = db
+        self._f = None
+        self._sc = None
+        self._n = 0         # 已读取的行数，用于重新打开后定位
+        self._pacer = pacer or Pacer()
+        self._open()
+
+    def _open(self):
+        self._ver = self._db._version
+        if file_exists(self._db.filepath):
+            try:
+                self._f = open(self._db.filepath, 'rb')
+                self._sc = LineScanner(self._f)
+            except Exception as e:
+                debug(f"aiter_records打开失败: {e}", "DB")
+
+    def _reopen(self):
+        """表在让出期间被重写：打开新文件并跳过已读的行"""
+        self.close()
+        self._open()
+        sc = self._sc
+        n = 0
+        while sc is not None and n < self._n and sc.next():
+            n += 1
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while self._sc is not None and self._sc.next():
+            self._n += 1
+            if self._pacer.due():
+                await asyncio.sleep(0)
+                self._pacer.restart()
+                if self._db._version != self._ver:
+                    # 当前行来自旧文件，回退一行后从新文件的同一位置重新读取
+                    self._n -= 1
+                    self._reopen()
+                    continue
+            try:
+                return json.loads(self._sc.line())
+            except:
+                pass
+        self.close()
+        raise StopAsyncIteration
+
+    def close(self):
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+            self._sc = None
+
+
+def _line_id(sc):
+    """当前行的数字 ID（无 id 或无法解析时返回 None）"""
+    try:
+        # 快速路径：直接从原始行提取 id，避免整行解析
+        raw = sc.raw(_ID_PAT)
+        if raw is not None:
+            if raw == b'None': return None
+            return int(raw)
+        obj = json.loads(sc.line())
+        if 'id' not in obj: return None
+        # Handle string IDs if they are numeric
+        return int(obj['id'])
+    except Exception as e:
+        debug(f"解析ID行失败: {e}", "DB")
+        return None
+
+
 class JsonlDB:
-    def __init__(self, filepath, auto_migrate=True):
+    def __init__(self, filepath, auto_migrate=True, record_cache_size=RECORD_CACHE_SIZE):
         self.filepath = filepath
+        base = filepath[:-6] if filepath.endswith('.jsonl') else filepath
+        # 表名（如 poems），写入后以此名向缓存管理器发布变更，供 register(depends=...) 匹配
+        self.table = base.rsplit('/', 1)[-1]
         # 注册到缓存管理器（替代 self._max_id_cache / self._count_cache）
         self._ck_maxid = 'db:' + filepath + ':maxid'
         self._ck_count = 'db:' + filepath + ':count'
-        cache.register(self._ck_maxid, ctype='value', initial=None)
-        cache.register(self._ck_count, ctype='value', initial=None)
+        cache.register(self._ck_maxid, ctype='value', initial=None, priority=PRIORITY_HIGH)
+        cache.register(self._ck_count, ctype='value', initial=None, priority=PRIORITY_HIGH)
+        # 表元数据文件（如 data/poems.meta.json），持久化 ID 序列
+        self._meta_path = base + '.meta.json'
+        self._ck_seq = 'db:' + filepath + ':seq'
+        cache.register(self._ck_seq, ctype='value', initial=None, priority=PRIORITY_HIGH)
+        self._seq_limit = 0     # 元数据中已预留到的 ID（不超过它的 ID 分配无需写文件）
+        # 行偏移索引：array('L') 第 n 项为第 n 条记录（文件顺序）的起始字节偏移
+        self._ck_offsets = 'db:' + filepath + ':offsets'
+        cache.register(self._ck_offsets, ctype='value', initial=None, priority=PRIORITY_HIGH)
+        # 记录级 LRU 缓存 {str(id): record}，record_cache_size=0 时不启用
+        self._ck_rec = None
+        if record_cache_size:
+            self._ck_rec = 'db:' + filepath + ':rec'
+            cache.register(self._ck_rec, ctype='dict', max_size=record_cache_size)
+        # 写入版本号：每次修改文件后递增，异步重写据此检测并发修改
+        self._version = 0
+        self._alock = None
         self._ensure_dir()
         if auto_migrate:
             self._migrate_legacy_json()
@@ -57,9 +344,20 @@ class JsonlDB:
     def append(self, record):
         """Append a new record to the end of file"""
         try:
+            offsets = cache.get_val(self._ck_offsets)
+            if offsets is not None:
+                # 新记录的起始偏移即追加前的文件大小
+                pos = os.stat(self.filepath)[6] if file_exists(self.filepath) else 0
             with open(self.filepath, 'a') as f:
                 f.write(json.dumps(record) + "\n")
+            self._version += 1
             # 维护缓存
+            if offsets is not None:
+                offsets.append(pos)
+                # 原地追加后重新登记占用，使预算核算包含新增的偏移
+                cache.set_val(self._ck_offsets, offsets)
+            if self._ck_rec and 'id' in record:
+                cache.invalidate(self._ck_rec, key=str(record['id']))
             cnt = cache.get_val(self._ck_count)
             if cnt is not None:
                 cache.set_val(self._ck_count, cnt + 1)
@@ -69,6 +367,7 @@ class JsonlDB:
                     pid = int(record['id'])
                     if pid > mid:
                         cache.set_val(self._ck_maxid, pid)
+            cache.notify(self.table, None, record)
             return True
         except Exception as e:
             error(f"追加记录失败: {e}", "DB")
@@ -81,22 +380,193 @@ class JsonlDB:
             return cached
         max_id = 0
         try:
-            with open(self.filepath, 'r') as f:
-                for line in f:
-                    if not line.strip(): continue
-                    try:
-                        obj = json.loads(line)
-                        if 'id' in obj:
-                            # Handle string IDs if they are numeric
-                            pid = int(obj['id']) 
-                            if pid > max_id: max_id = pid
-                    except Exception as e:
-                        debug(f"解析ID行失败: {e}", "DB")
+            with open(self.filepath, 'rb') as f:
+                sc = LineScanner(f)
+                while sc.next():
+                    pid = _line_id(sc)
+                    if pid is not None and pid > max_id: max_id = pid
         except OSError:
             pass  # 文件可能不存在，正常情况
         cache.set_val(self._ck_maxid, max_id)
         return max_id
 
+    def _load_meta(self):
+        """读取表元数据，文件不存在或损坏时返回空字典"""
+        try:
+            with open(self._meta_path, 'r') as f:
+                meta = json.load(f)
+                return meta if isinstance(meta, dict) else {}
+        except Exception:
+            return {}
+
+    def _save_meta(self, meta):
+        """
+        写入表元数据（临时文件 + 重命名覆盖）
+        LittleFS 的 rename 原子替换已存在的目标；不支持覆盖的文件系统（FAT）才先删除再重命名
+        """
+        tmp_path = self._meta_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        try:
+            os.rename(tmp_path, self._meta_path)
+        except OSError:
+            os.remove(self._meta_path)
+            os.rename(tmp_path, self._meta_path)
+
+    def next_id(self):
+        """
+        分配新记录 ID（持久化单调序列）
+        - O(1)：序列值常驻缓存，仅首次加载（或缓存被清除后）才读取元数据
+        - 按块预留：元数据记录已预留到的 ID，每 ID_BLOCK 次分配才写一次闪存；
+          重启后从预留上限继续，未用完的 ID 被跳过（ID 允许不连续，但不会重复）
+        - 不复用已删除的 ID：序列只增不减，并与文件中的最大 ID 取较大值
+        - 协程安全：分配过程无 await，uasyncio 下不会被其他请求打断
+        """
+        seq = cache.get_val(self._ck_seq)
+        if seq is None:
+            meta = self._load_meta()
+            seq = max(int(meta.get('seq', 0)), self.get_max_id())
+        seq += 1
+        cache.set_val(self._ck_seq, seq)
+        if seq > self._seq_limit:
+            limit = seq + ID_BLOCK - 1
+            try:
+                self._save_meta({'seq': limit})
+                self._seq_limit = limit
+            except Exception as e:
+                error(f"保存ID序列失败: {e}", "DB")
+        return seq
+
+    def _offset_steps(self, offsets, pacer=None, max_id=None):
+        """
+        扫描生成器：将各行起始偏移追加到 offsets，pacer 到点时让出（同步调用时为 None）
+        max_id 为单元素列表时同时求最大 ID（存入 max_id[0]）
+        """
+        if not file_exists(self.filepath):
+            return
+        try:
+            with open(self.filepath, 'rb') as f:
+                sc = LineScanner(f)
+                while sc.next():
+                    offsets.append(sc.pos)
+                    if max_id is not None:
+                        pid = _line_id(sc)
+                        if pid is not None and pid > max_id[0]: max_id[0] = pid
+                    if pacer is not None and pacer.due():
+                        yield
+        except Exception as e:
+            debug(f"读取文件偏移失败: {e}", "DB")
+
+    def _line_offsets(self):
+        """获取行偏移索引（带缓存，首次调用时扫描文件建立）"""
+        offsets = cache.get_val(self._ck_offsets)
+        if offsets is not None:
+            return offsets
+        offsets = array('L')
+        for _ in self._offset_steps(offsets):
+            pass
+        cache.set_val(self._ck_offsets, offsets)
+        cache.set_val(self._ck_count, len(offsets))
+        return offsets
+
+    async def _aline_offsets(self):
+        """_line_offsets 的异步版本，首次建立索引时分段让出"""
+        offsets = cache.get_val(self._ck_offsets)
+        if offsets is not None:
+            return offsets
+        ver = self._version
+        offsets = array('L')
+        pacer = Pacer()
+        await _paced(self._offset_steps(offsets, pacer), pacer)
+        if self._version != ver:
+            # 扫描期间文件被修改，偏移可能失效，改为同步重建
+            return self._line_offsets()
+        cache.set_val(self._ck_offsets, offsets)
+        cache.set_val(self._ck_count, len(offsets))
+        return offsets
+
+    async def awarm(self):
+        """
+        预热索引缓存（启动预热任务调用）：一次分段让出的扫描同时建立行偏移索引（得到记录数）与最大ID；
+        扫描期间表被修改则放弃结果，由之后的请求按需建立
+        """
+        if cache.peek(self._ck_offsets) is not None and cache.peek(self._ck_maxid) is not None:
+            return
+        ver = self._version
+        offsets = array('L')
+        max_id = [0]
+        pacer = Pacer()
+        await _paced(self._offset_steps(offsets, pacer, max_id), pacer)
+        if self._version == ver:
+            cache.set_val(self._ck_offsets, offsets)
+            cache.set_val(self._ck_count, len(offsets))
+            cache.set_val(self._ck_maxid, max_id[0])
+
+    def _read_at(self, f, off):
+        """读取并解析指定偏移处的一行记录，失败返回 None"""
+        f.seek(off)
+        try:
+            return json.loads(f.readline())
+        except Exception as e:
+            debug(f"解析记录失败: {e}", "DB")
+            return None
+
+    def get_by_ordinal(self, n):
+        """按序号获取记录（文件顺序，从 0 开始），基于行偏移索引 O(1) 定位"""
+        offsets = self._line_offsets()
+        if n < 0 or n >= len(offsets):
+            return None
+        try:
+            with open(self.filepath, 'r') as f:
+                return self._read_at(f, offsets[n])
+        except Exception as e:
+            debug(f"按序号读取失败: {e}", "DB")
+            return None
+
+    def _read_page(self, offsets, page, limit, reverse):
+        """按偏移列表读取一页记录，倒序时按下标换算，无需复制反转"""
+        total = len(offsets)
+        start_idx = (page - 1) * limit
+        end_idx = min(start_idx + limit, total)
+        results = []
+        if start_idx < end_idx:
+            try:
+                with open(self.filepath, 'r') as f:
+                    for i in range(start_idx, end_idx):
+                        record = self._read_at(f, offsets[total - 1 - i] if reverse else offsets[i])
+                        if record is not None:
+                            results.append(record)
+            except Exception as e:
+                debug(f"读取分页记录失败: {e}", "DB")
+        return results
+
+    def _search_steps(self, search_lower, matched, pacer=None):
+        """
+        搜索扫描生成器：将匹配行的偏移追加到 matched，pacer 到点时让出
+        先在原始块中粗筛（不解析JSON），再解析候选行精确匹配字段值
+        """
+        needle = search_lower.encode()
+        # 仅当搜索词含 ASCII 字母时才需要忽略大小写比较（中文无大小写，省去整块转换）
+        fold = needle.upper() != needle
+        try:
+            with open(self.filepath, 'rb') as f:
+                sc = LineScanner(f)
+                while sc.next():
+                    if pacer is not None and pacer.due():
+                        yield
+                    if not sc.contains(needle, fold):
+                        continue
+                    try:
+                        obj = json.loads(sc.line())
+                        for k, v in obj.items():
+                            if search_lower in str(v).lower():
+                                matched.append(sc.pos)
+                                break
+                    except:
+                        pass
+        except Exception as e:
+            debug(f"搜索文件读取失败: {e}", "DB")
+
     def fetch_page(self, page=1, limit=10, reverse=True, search_term=None, search_fields=None):
         """
         Fetch a page of records.
@@ -105,97 +575,80 @@ class JsonlDB:
         """
         if not file_exists(self.filepath): return [], 0
         
-        search_lower = search_term.lower() if search_term else None
-        
-        if not search_lower:
+        if not search_term:
             # --- Fast Path: No Search ---
-            offsets = []
-            try:
-                with open(self.filepath, 'r') as f:
-                    while True:
-                        pos = f.tell()
-                        line = f.readline()
-                        if not line: break
-                        if line.strip(): offsets.append(pos)
-            except Exception as e:
-                debug(f"读取文件偏移失败: {e}", "DB")
-            
-            total = len(offsets)
-            if reverse: offsets.reverse()
-            
-            # Pagination Logic
-            start_idx = (page - 1) * limit
-            end_idx = start_idx + limit
-            
-            target_offsets = offsets[start_idx:end_idx]
-            results = []
-            
-            if target_offsets:
-                with open(self.filepath, 'r') as f:
-                    for off in target_offsets:
-                        f.seek(off)
-                        line = f.readline()
-                        try:
-                            results.append(json.loads(line))
-                        except Exception as e:
-                            debug(f"解析记录失败: {e}", "DB")
-            return results, total
-            
+            # 使用缓存的行偏移索引
+            offsets = self._line_offsets()
         else:
             # --- Slow Path: Search (Scan Full File) ---
-            # 内存优化：先扫描记录匹配行的偏移量，最后只解析需要的分页范围
-            matched_offsets = []
-            try:
-                with open(self.filepath, 'r') as f:
-                    while True:
-                        pos = f.tell()
-                        line = f.readline()
-                        if not line: break
-                        if not line.strip(): continue
-                        
-                        # 快速检查：先在原始行中搜索（不解析JSON）
-                        if search_lower not in line.lower():
-                            continue
-                        
-                        # 确认匹配：解析JSON后精确匹配字段值
-                        try:
-                            obj = json.loads(line)
-                            found = False
-                            for k, v in obj.items():
-                                if search_lower in str(v).lower():
-                                    found = True
-                                    break
-                            if found:
-                                matched_offsets.append(pos)
-                        except:
-                            pass
-            except Exception as e:
-                debug(f"搜索文件读取失败: {e}", "DB")
-            
-            total = len(matched_offsets)
-            if reverse:
-                matched_offsets.reverse()
-            
-            # 只读取当前页需要的记录
-            start_idx = (page - 1) * limit
-            end_idx = start_idx + limit
-            target_offsets = matched_offsets[start_idx:end_idx]
-            
-            results = []
-            if target_offsets:
+            # 内存优化：先记录匹配行的偏移量，最后只解析需要的分页范围
+            offsets = array('L')
+            for _ in self._search_steps(search_term.lower(), offsets):
+                pass
+        return self._read_page(offsets, page, limit, reverse), len(offsets)
+
+    async def afetch_page(self, page=1, limit=10, reverse=True, search_term=None, search_fields=None):
+        """
+        fetch_page 的异步版本：全文搜索或首次建立偏移索引时分段让出事件循环，
+        避免长扫描阻塞其他连接；结果与 fetch_page 一致
+        """
+        if not file_exists(self.filepath): return [], 0
+        
+        if not search_term:
+            offsets = await self._aline_offsets()
+        else:
+            ver = self._version
+            offsets = array('L')
+            pacer = Pacer()
+            await _paced(self._search_steps(search_term.lower(), offsets, pacer), pacer)
+            if self._version != ver:
+                # 扫描期间文件被重写，偏移指向旧文件，改为同步重新搜索
+                return self.fetch_page(page, limit, reverse, search_term, search_fields)
+        return self._read_page(offsets, page, limit, reverse), len(offsets)
+
+    def _update_steps(self, key, update_func, tmp_path, res, pacer=None):
+        """
+        重写扫描生成器：将更新后的全部记录写入 tmp_path，命中的记录存入 res[0]，更新前的副本存入 res[1]
+        pacer 到点时让出（同步调用时为 None）
+        """
+        bkey = key.encode()
+        with open(self.filepath, 'rb') as f_in, open(tmp_path, 'wb') as f_out:
+            sc = LineScanner(f_in)
+            while sc.next():
+                if pacer is not None and pacer.due():
+                    yield
+                # 快速路径：id 不匹配的行原样写回，无需解析和重新序列化
+                raw = sc.raw(_ID_PAT)
+                if raw is not None and raw != bkey:
+                    sc.copy_to(f_out)
+                    continue
                 try:
-                    with open(self.filepath, 'r') as f:
-                        for off in target_offsets:
-                            f.seek(off)
-                            line = f.readline()
-                            try:
-                                results.append(json.loads(line))
-                            except:
-                                pass
+                    record = json.loads(sc.line())
+                    r_id = record.get('id')
+                    # loose comparison
+                    if str(r_id) == key:
+                        res[1] = dict(record)  # 更新前的快照，用于发布变更
+                        update_func(record)
+                        res[0] = record
+                    f_out.write((json.dumps(record) + '\n').encode())
                 except Exception as e:
-                    debug(f"读取搜索结果失败: {e}", "DB")
-            
-            return results, total
+                    debug(f"更新解析记录失败: {e}", "DB")
+
+    def _commit_update(self, key, found, old, tmp_path):
+        """以临时文件替换原文件、维护缓存并发布变更；未命中时仅清理临时文件"""
+        if found is None:
+            os.remove(tmp_path)
+            return False
+        os.remove(self.filepath)
+        os.rename(tmp_path, self.filepath)
+        self._version += 1
+        # 重写后行偏移整体变化，索引置空重建
+        cache.invalidate(self._ck_offsets)
+        # 以更新后的记录刷新记录缓存
+        if self._ck_rec:
+            cache.put(self._ck_rec, key, found)
+        cache.notify(self.table, old, found)
+        return True
 
     def update(self, id_val, update_func):
         """
@@ -205,63 +658,88 @@ class JsonlDB:
         if not file_exists(self.filepath): return False
         
         tmp_path = self.filepath + '.tmp'
-        found = False
+        key = str(id_val)
+        res = [None, None]
         try:
-            with open(self.filepath, 'r') as f_in, open(tmp_path, 'w') as f_out:
-                for line in f_in:
-                    if not line.strip(): continue
-                    try:
-                        record = json.loads(line)
-                        r_id = record.get('id')
-                        # loose comparison
-                        if str(r_id) == str(id_val):
-                            update_func(record)
-                            found = True
-                        f_out.write(json.dumps(record) + '\n')
-                    except Exception as e:
-                        debug(f"更新解析记录失败: {e}", "DB")
-            
-            if found:
-                os.remove(self.filepath)
-                os.rename(tmp_path, self.filepath)
-                return True
-            else:
-                os.remove(tmp_path)
-                return False
+            for _ in self._update_steps(key, update_func, tmp_path, res):
+                pass
+            return self._commit_update(key, res[0], res[1], tmp_path)
         except Exception as e:
             error(f"更新记录失败: {e}", "DB")
             if file_exists(tmp_path): os.remove(tmp_path)
             return False
 
+    async def aupdate(self, id_val, update_func):
+        """
+        update 的异步版本：重写过程中分段让出事件循环
+        - 使用独立的临时文件，同表的异步重写经锁串行执行
+        - 让出期间若表被其他请求修改（版本号变化），丢弃本次结果重新扫描；
+          重试 AREWRITE_RETRIES 次后改为一次性同步完成，保证不丢失并发写入
+        - update_func 可能被调用多次（每次作用于新解析的记录），不应有副作用
+        """
+        if not file_exists(self.filepath): return False
+        
+        if self._alock is None:
+            self._alock = asyncio.Lock()
+        tmp_path = self.filepath + '.a.tmp'
+        key = str(id_val)
+        res = [None, None]
+        async with self._alock:
+            try:
+                for attempt in range(AREWRITE_RETRIES + 1):
+                    ver = self._version
+                    res[0] = res[1] = None
+                    pacer = Pacer() if attempt < AREWRITE_RETRIES else None
+                    await _paced(self._update_steps(key, update_func, tmp_path, res, pacer), pacer)
+                    if self._version == ver:
+                        return self._commit_update(key, res[0], res[1], tmp_path)
+                    debug(f"异步更新期间表已变更，重新扫描: {self.filepath}", "DB")
+            except Exception as e:
+                error(f"更新记录失败: {e}", "DB")
+                if file_exists(tmp_path): os.remove(tmp_path)
+                return False
+
     def delete(self, id_val):
         """Rewrite file excluding record"""
         if not file_exists(self.filepath): return False
         tmp_path = self.filepath + '.tmp'
-        found = False
+        key = str(id_val)
+        bkey = key.encode()
+        found = None
         try:
-            with open(self.filepath, 'r') as f_in, open(tmp_path, 'w') as f_out:
-                for line in f_in:
-                    if not line.strip(): continue
+            with open(self.filepath, 'rb') as f_in, open(tmp_path, 'wb') as f_out:
+                sc = LineScanner(f_in)
+                while sc.next():
+                    # 快速路径：id 不匹配的行原样写回
+                    raw = sc.raw(_ID_PAT)
+                    if raw is not None and raw != bkey:
+                        sc.copy_to(f_out)
+                        continue
                     try:
-                        record = json.loads(line)
-                        if str(record.get('id')) == str(id_val):
-                            found = True
+                        record = json.loads(sc.line())
+                        if str(record.get('id')) == key:
+                            found = record
                             continue # Skip writing
-                        f_out.write(json.dumps(record) + '\n')
+                        f_out.write((json.dumps(record) + '\n').encode())
                     except Exception as e:
                         debug(f"删除解析记录失败: {e}", "DB")
             
-            if not found:
+            if found is None:
                 # 未找到目标记录，清理临时文件，跳过无意义的文件替换
                 os.remove(tmp_path)
                 return False
             os.remove(self.filepath)
             os.rename(tmp_path, self.filepath)
+            self._version += 1
             # 删除成功，维护缓存
+            cache.invalidate(self._ck_offsets)
+            if self._ck_rec:
+                cache.invalidate(self._ck_rec, key=key)
             cnt = cache.get_val(self._ck_count)
             if cnt is not None and cnt > 0:
                 cache.set_val(self._ck_count, cnt - 1)
             cache.set_val(self._ck_maxid, None)  # 删除后 max_id 可能变化，置空重算
+            cache.notify(self.table, found, None)
             return True
         except Exception as e:
             error(f"删除记录失败: {e}", "DB")
@@ -272,25 +750,40 @@ class JsonlDB:
         """Load ALL records (Use only for small datasets like Members/Settings)"""
         res = []
         if not file_exists(self.filepath): return []
-        with open(self.filepath, 'r') as f:
-            for line in f:
-                if line.strip():
-                    try:
-                        res.append(json.loads(line))
-                    except Exception as e:
-                        debug(f"get_all解析记录失败: {e}", "DB")
+        with open(self.filepath, 'rb') as f:
+            sc = LineScanner(f)
+            while sc.next():
+                try:
+                    res.append(json.loads(sc.line()))
+                except Exception as e:
+                    debug(f"get_all解析记录失败: {e}", "DB")
         return res
 
     def get_by_id(self, id_val):
-        """根据ID获取单条记录"""
+        """
+        根据ID获取单条记录（优先读取记录缓存）
+        注意：返回的记录可能是缓存中的共享对象，调用方不应原地修改
+        """
+        key = str(id_val)
+        if self._ck_rec:
+            cached = cache.get(self._ck_rec, key)
+            if cached is not None:
+                return cached
         if not file_exists(self.filepath): return None
+        bkey = key.encode()
         try:
-            with open(self.filepath, 'r') as f:
-                for line in f:
-                    if not line.strip(): continue
+            with open(self.filepath, 'rb') as f:
+                sc = LineScanner(f)
+                while sc.next():
+                    # 快速路径：原始行 id 不匹配则跳过，只解析候选行
+                    raw = sc.raw(_ID_PAT)
+                    if raw is not None and raw != bkey:
+                        continue
                     try:
-                        record = json.loads(line)
-                        if str(record.get('id')) == str(id_val):
+                        record = json.loads(sc.line())
+                        if str(record.get('id')) == key:
+                            if self._ck_rec:
+                                cache.put(self._ck_rec, key, record)
                             return record
                     except:
                         pass
@@ -298,21 +791,60 @@ class JsonlDB:
             debug(f"get_by_id读取失败: {e}", "DB")
         return None
 
+    def find_one(self, field, value):
+        """按标量字段查找第一条匹配记录（如手机号），只解析原始行中字段值匹配的行"""
+        if not file_exists(self.filepath): return None
+        target = str(value)
+        btarget = target.encode()
+        pat = key_pattern(field)
+        try:
+            with open(self.filepath, 'rb') as f:
+                sc = LineScanner(f)
+                while sc.next():
+                    raw = sc.raw(pat)
+                    if raw is not None and raw != btarget:
+                        continue
+                    try:
+                        record = json.loads(sc.line())
+                        if str(record.get(field)) == target:
+                            return record
+                    except:
+                        pass
+        except Exception as e:
+            debug(f"find_one读取失败: {e}", "DB")
+        return None
+
     def iter_records(self):
         """流式迭代器：逐行读取记录，内存友好（用于聚合计算）"""
         if not file_exists(self.filepath):
             return
         try:
-            with open(self.filepath, 'r') as f:
-                for line in f:
-                    if line.strip():
-                        try:
-                            yield json.loads(line)
-                        except:
-                            pass
+            with open(self.filepath, 'rb') as f:
+                sc = LineScanner(f)
+                while sc.next():
+                    try:
+                        yield json.loads(sc.line())
+                    except:
+                        pass
         except Exception as e:
             debug(f"iter_records失败: {e}", "DB")
 
+    def aiter_records(self):
+        """iter_records 的异步版本（async for），逐行解析并定期让出事件循环"""
+        return AsyncRecordIter(self)
+
+    def invalidate_cache(self):
+        """清除本表全部缓存并发布整表变更（绕过 JsonlDB 直接重写文件后调用，如备份导入）"""
+        self._version += 1
+        cache.invalidate(self._ck_count)
+        cache.invalidate(self._ck_maxid)
+        # 导入的数据可能包含更大的 ID，下次分配时重新与文件最大 ID 对齐
+        cache.invalidate(self._ck_seq)
+        cache.invalidate(self._ck_offsets)
+        if self._ck_rec:
+            cache.invalidate(self._ck_rec)
+        cache.notify(self.table)
+
     def count(self):
         """统计记录数量（带缓存，只计数，不解析JSON，内存友好）"""
         cached = cache.get_val(self._ck_count)
@@ -320,12 +852,17 @@ class JsonlDB:
             return cached
         if not file_exists(self.filepath):
             return 0
+        # 已有行偏移索引时直接取长度
+        offsets = cache.get_val(self._ck_offsets)
+        if offsets is not None:
+            cache.set_val(self._ck_count, len(offsets))
+            return len(offsets)
         count = 0
         try:
-            with open(self.filepath, 'r') as f:
-                for line in f:
-                    if line.strip():
-                        count += 1
+            with open(self.filepath, 'rb') as f:
+                sc = LineScanner(f)
+                while sc.next():
+                    count += 1
         except Exception as e:
             debug(f"统计记录数失败: {e}", "DB")
         cache.set_val(self._ck_count, count)
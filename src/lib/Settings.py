@@ -3,7 +3,7 @@
 
 import json
 from lib.Logger import error
-from lib.CacheManager import cache
+from lib.CacheManager import cache, PRIORITY_HIGH
 
 # 默认Token过期天数
 DEFAULT_TOKEN_EXPIRE_DAYS = 30
@@ -16,7 +16,7 @@ SETTINGS_KEYS = [
 ]
 
 # 注册设置缓存槽
-cache.register('settings', ctype='value', ttl=3600, initial=None)
+cache.register('settings', ctype='value', ttl=3600, initial=None, priority=PRIORITY_HIGH)
 
 
 def invalidate_settings_cache():
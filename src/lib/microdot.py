@@ -2,46 +2,231 @@ import sys
 import uasyncio as asyncio
 import io
 
+# 响应写出参数
+CHUNK_SIZE = 4096        # 文件/大响应体每次写出的块大小（字节）
+BUFFER_POOL_SIZE = 2     # 共享读缓冲区池容量，超出时临时分配、用后丢弃
+DRAIN_BYTES = 16384      # 发送缓冲无积压时，每写出这么多字节才 drain 一次
+
+# 请求头解析参数
+READ_SIZE = 1024         # 读取请求头时每次从连接读取的字节数
+MAX_HEAD_SIZE = 4096     # 请求行 + 请求头总字节数上限，超出返回 431
+MAX_HEADERS = 32         # 请求头行数上限，超出返回 431
+
+_REASONS = {
+    200: 'OK', 204: 'No Content', 206: 'Partial Content', 301: 'Moved Permanently',
+    302: 'Found', 304: 'Not Modified', 400: 'Bad Request', 401: 'Unauthorized',
+    403: 'Forbidden', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large',
+    431: 'Request Header Fields Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable',
+}
+
+_buf_pool = []
+
+def _acquire_buffer():
+    """从共享池取出一个 CHUNK_SIZE 读缓冲区"""
+    return _buf_pool.pop() if _buf_pool else bytearray(CHUNK_SIZE)
+
+def _release_buffer(buf):
+    if len(_buf_pool) < BUFFER_POOL_SIZE and len(buf) == CHUNK_SIZE:
+        _buf_pool.append(buf)
+
+class _Drainer:
+    """
+    自适应 drain：底层发送缓冲有积压时立即等待发送完成，
+    否则累计写出 DRAIN_BYTES 字节才让出一次（uasyncio 的 drain 即使无积压也会让出）
+    """
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.pending = 0
+
+    async def wrote(self, n):
+        self.pending += n
+        if self.pending >= DRAIN_BYTES or getattr(self.writer, 'out_buf', None):
+            self.pending = 0
+            await self.writer.drain()
+
+    async def flush(self):
+        self.pending = 0
+        await self.writer.drain()
+
+class ConnReader:
+    """
+    连接级缓冲读取器：请求头整块读入一个缓冲区，多读到的字节（请求体开头或管线化的下一个请求）
+    留在缓冲中供后续 read/read_head 使用，长连接上跨请求复用
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._buf = b''
+
+    async def read(self, n=-1):
+        buf = self._buf
+        if not buf:
+            return await self.stream.read(n)
+        if n < 0 or n >= len(buf):
+            self._buf = b''
+            return buf
+        self._buf = buf[n:]
+        return buf[:n]
+
+    async def read_head(self, max_size=MAX_HEAD_SIZE):
+        """
+        读取到空行为止，返回请求行与请求头（以最后一个头的 \r\n 结尾，不含空行）；
+        连接关闭返回 b''，超过 max_size 抛出 ValueError(431)
+        """
+        buf = self._buf
+        start = 0
+        while True:
+            if buf[:1] in (b'\r', b'\n'):
+                # 忽略请求之间多余的空行（部分客户端在请求体后追加 CRLF）
+                buf = buf.lstrip(b'\r\n')
+                start = 0
+            end = buf.find(b'\r\n\r\n', start)
+            if end > max_size or (end < 0 and len(buf) > max_size):
+                raise ValueError(431)
+            if end >= 0:
+                self._buf = buf[end + 4:]
+                return buf[:end + 2]
+            start = len(buf) - 3 if len(buf) > 3 else 0
+            chunk = await self.stream.read(READ_SIZE)
+            if not chunk:
+                self._buf = b''
+                return b''
+            buf = buf + chunk if buf else chunk
+
+class Headers:
+    """
+    惰性请求头：保存整块原始请求头，仅在访问某个头时查找并解码，结果缓存
+    键名一律使用小写（与客户端发送的大小写无关）
+    """
+
+    def __init__(self, raw=b''):
+        self._raw = raw
+        self._lower = None
+        self._cache = {}
+
+    def _find(self, name):
+        try:
+            return self._cache[name]
+        except KeyError:
+            pass
+        raw = self._raw
+        if self._lower is None:
+            self._lower = raw.lower()
+        key = b'\r\n' + name.encode() + b':'
+        i = self._lower.find(key)
+        value = None
+        if i >= 0:
+            i += len(key)
+            try:
+                value = raw[i:raw.find(b'\r\n', i)].strip().decode()
+            except UnicodeError:
+                # 头部值不是合法 UTF-8：按请求格式错误处理（MicroPython 的 decode 不支持替换字符）
+                raise ValueError(400)
+        self._cache[name] = value
+        return value
+
+    def get(self, name, default=None):
+        value = self._find(name)
+        return default if value is None else value
+
+    def __contains__(self, name):
+        return self._find(name) is not None
+
+    def __getitem__(self, name):
+        value = self._find(name)
+        if value is None:
+            raise KeyError(name)
+        return value
+
+    def __setitem__(self, name, value):
+        self._cache[name] = value
+
 class Request:
     def __init__(self, reader):
         self.reader = reader
         self.client_ip = ''
         self.method = 'GET'
         self.path = '/'
-        self.headers = {}
-        self.args = {}
+        self.query = ''
+        self.version = 'HTTP/1.0'
+        self.headers = Headers()
+        self._args = None
         self.body = b''
         self.json = None
+        # 流式请求体（仅 stream=True 的路由），此时 body 为 None
+        self.stream = None
+        # 请求级上下文：业务层在同一请求内共享的计算结果（如鉴权信息）
+        self.g = {}
 
-    async def read_request(self):
-        line = await self.reader.readline()
-        if not line:
-            return False
-        line = line.decode().strip()
-        parts = line.split()
-        if len(parts) >= 2:
-            self.method = parts[0]
-            self.path = parts[1]
-            if '?' in self.path:
-                self.path, query = self.path.split('?', 1)
-                for arg in query.split('&'):
+    @property
+    def args(self):
+        """查询参数，首次访问时才解析"""
+        if self._args is None:
+            self._args = {}
+            if self.query:
+                for arg in self.query.split('&'):
                     if '=' in arg:
                         k, v = arg.split('=', 1)
-                        self.args[k] = v
+                        self._args[k] = v
+        return self._args
 
-        while True:
-            line = await self.reader.readline()
-            if not line or line == b'\r\n':
-                break
-            line = line.decode().strip()
-            if ':' in line:
-                k, v = line.split(':', 1)
-                self.headers[k.strip().lower()] = v.strip()
+    async def read_request(self, timeout=None):
+        """读取并解析完整请求（请求头 + 请求体）"""
+        if not await self.read_head(timeout):
+            return False
+        return await self.read_body()
+
+    def content_length(self):
+        try:
+            return int(self.headers.get('content-length', 0))
+        except ValueError:
+            return 0
+
+    async def read_head(self, timeout=None, max_size=MAX_HEAD_SIZE, max_headers=MAX_HEADERS):
+        """
+        读取请求行与请求头；timeout 为等待完整请求头的超时秒数，超时返回 False
+        reader 须为 ConnReader；请求头超限抛出 ValueError(431)，请求行格式错误抛出 ValueError(400)
+        """
+        try:
+            if timeout:
+                head = await asyncio.wait_for(self.reader.read_head(max_size), timeout)
+            else:
+                head = await self.reader.read_head(max_size)
+        except asyncio.TimeoutError:
+            return False
+        if not head:
+            return False
+        i = head.find(b'\r\n')
+        if head.count(b'\r\n') - 1 > max_headers:
+            raise ValueError(431)
+        try:
+            parts = head[:i].decode().split()
+        except UnicodeError:
+            raise ValueError(400)
+        if len(parts) < 2:
+            raise ValueError(400)
+        self.method = parts[0]
+        path = parts[1]
+        if len(parts) >= 3:
+            self.version = parts[2]
+        q = path.find('?')
+        if q >= 0:
+            self.query = path[q + 1:]
+            path = path[:q]
+        self.path = path
+        self.headers = Headers(head)
+        # 预先解码决定连接处理方式的头部，编码错误在此处以 400 回复，而不是在之后的路由阶段抛出
+        for name in ('connection', 'content-length', 'transfer-encoding'):
+            self.headers.get(name)
+        return True
 
+    async def read_body(self, max_size=614400):
+        """将请求体完整读入内存（默认上限 600KB，超出返回 False）"""
         if 'content-length' in self.headers:
-            length = int(self.headers['content-length'])
-            # 限制单次请求最大大小为600KB，防止内存溢出
-            if length > 614400:  # 600KB
+            length = self.content_length()
+            # 限制单次请求最大大小，防止内存溢出
+            if length > max_size:
                 return False  # 请求太大，拒绝处理
             # 统一使用循环读取，确保完整读取所有数据
             # 异步网络I/O中单次read可能不返回所有请求的数据
@@ -83,86 +268,376 @@ class Request:
                     pass
         return True
 
+    def keep_alive(self):
+        """客户端是否希望保持连接：HTTP/1.1 默认保持，HTTP/1.0 需显式声明"""
+        conn = self.headers.get('connection', '').lower()
+        if 'transfer-encoding' in self.headers:
+            return False  # 不支持分块请求体，无法确定请求边界
+        if self.version == 'HTTP/1.1':
+            return conn != 'close'
+        return conn == 'keep-alive'
+
+class BodyStream:
+    """
+    流式请求体读取器：按块从连接读取，不在内存中拼接完整请求体
+    用法：
+        chunk = await request.stream.read(4096)   # 返回 b'' 表示读完
+        async for chunk in request.stream: ...
+        await request.stream.spool('data/upload.tmp')  # 转存到闪存
+    """
+
+    def __init__(self, reader, length):
+        self.reader = reader
+        self.remaining = length
+        self.truncated = False   # 客户端提前断开，未收到声明的全部长度
+
+    async def read(self, n=CHUNK_SIZE):
+        if self.remaining <= 0:
+            return b''
+        chunk = await self.reader.read(min(n, self.remaining))
+        if not chunk:
+            self.truncated = True
+            self.remaining = 0
+            return b''
+        self.remaining -= len(chunk)
+        return chunk
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        chunk = await self.read()
+        if not chunk:
+            raise StopAsyncIteration
+        return chunk
+
+    async def spool(self, path):
+        """将剩余请求体写入文件，返回写入字节数；请求体不完整时抛出 OSError"""
+        n = 0
+        with open(path, 'wb') as f:
+            while True:
+                chunk = await self.read()
+                if not chunk:
+                    break
+                f.write(chunk)
+                n += len(chunk)
+        if self.truncated:
+            raise OSError('request body truncated')
+        return n
+
 class Response:
     def __init__(self, body='', status_code=200, headers=None):
         self.body = body
         self.status_code = status_code
         self.headers = headers or {}
-        if 'Content-Type' not in self.headers:
+        # 204/304 无消息体，不附加默认类型（304 的头部会覆盖客户端缓存的头部）
+        if 'Content-Type' not in self.headers and status_code not in (204, 304):
             self.headers['Content-Type'] = 'text/plain'
 
-    async def write(self, writer):
-        writer.write(f'HTTP/1.1 {self.status_code} OK\r\n'.encode())
-        for k, v in self.headers.items():
-            writer.write(f'{k}: {v}\r\n'.encode())
-        
-        # Check for file-like object (has read method)
-        if hasattr(self.body, 'read'):
-            writer.write(b'\r\n')
-            await writer.drain()
-            
-            buf = bytearray(1024)
+    def is_stream(self):
+        """消息体是否为流式生成器/异步迭代器（逐块产出 str 或 bytes）"""
+        b = self.body
+        if hasattr(b, 'read'):
+            return False
+        return hasattr(b, '__anext__') or hasattr(b, 'send') or hasattr(b, '__next__')
+
+    async def _write_stream(self, writer):
+        """
+        逐块写出流式消息体；声明了 chunked 时按分块编码封装，
+        块长度行、数据与结尾 CRLF 在共享缓冲区中拼好后一次写出（超出缓冲区的大块拼接为一个 bytes）
+        """
+        chunked = self.headers.get('Transfer-Encoding') == 'chunked'
+        body = self.body
+        is_async = hasattr(body, '__anext__')
+        if not is_async:
+            body = iter(body)
+        drainer = _Drainer(writer)
+        if chunked:
+            buf = _acquire_buffer()
+            mv = memoryview(buf)
+        try:
             while True:
                 try:
-                    l = self.body.readinto(buf)
-                    if not l: break
-                    writer.write(buf[:l])
-                    await writer.drain()
-                except Exception:
+                    piece = await body.__anext__() if is_async else next(body)
+                except (StopIteration, StopAsyncIteration):
                     break
+                if isinstance(piece, str):
+                    piece = piece.encode()
+                if not piece:
+                    continue
+                if chunked:
+                    size = ('%x\r\n' % len(piece)).encode()
+                    h = len(size)
+                    n = h + len(piece) + 2
+                    if n <= CHUNK_SIZE:
+                        buf[:h] = size
+                        buf[h:n - 2] = piece
+                        buf[n - 2:n] = b'\r\n'
+                        writer.write(mv[:n])
+                    else:
+                        writer.write(b''.join((size, piece, b'\r\n')))
+                else:
+                    writer.write(piece)
+                await drainer.wrote(len(piece))
+        except OSError:
+            raise
+        except Exception as e:
+            # 头部已发出，无法再返回错误状态：中止连接让客户端感知响应不完整
+            sys.print_exception(e)
+            raise OSError('stream aborted')
+        finally:
+            if chunked:
+                mv = None
+                _release_buffer(buf)
+            # 提前结束时释放生成器占用的资源（如打开的文件）
             try:
-                self.body.close()
+                body.close()
             except:
                 pass
+        if chunked:
+            writer.write(b'0\r\n\r\n')
+        await drainer.flush()
+
+    def _head(self, extra=None):
+        """状态行与全部头部一次拼接编码，整体作为一次写出"""
+        parts = ['HTTP/1.1 ', str(self.status_code), ' ', _REASONS.get(self.status_code, 'OK'), '\r\n']
+        for k, v in self.headers.items():
+            parts.append(k)
+            parts.append(': ')
+            parts.append(str(v))
+            parts.append('\r\n')
+        if extra:
+            parts.append(extra)
+        parts.append('\r\n')
+        return ''.join(parts).encode()
+
+    async def write(self, writer):
+        # Check for file-like object (has read method)
+        if hasattr(self.body, 'read'):
+            writer.write(self._head())
+            buf = _acquire_buffer()
+            mv = memoryview(buf)
+            drainer = _Drainer(writer)
+            try:
+                while True:
+                    try:
+                        l = self.body.readinto(buf)
+                    except Exception:
+                        # 已声明长度却无法读完：中止连接，避免长连接上响应错位
+                        raise OSError('file read failed')
+                    if not l: break
+                    # memoryview 切片不复制；写入后数据已发出或已被复制进发送缓冲，缓冲区可立即复用
+                    writer.write(mv[:l])
+                    await drainer.wrote(l)
+                await drainer.flush()
+            finally:
+                mv = None
+                _release_buffer(buf)
+                try:
+                    self.body.close()
+                except:
+                    pass
+        elif self.is_stream():
+            writer.write(self._head())
+            await self._write_stream(writer)
+        elif self.status_code in (204, 304):
+            # 无响应体的状态码：不发送消息体，长连接据此确定响应边界
+            writer.write(self._head())
+            await writer.drain()
         else:
             body_data = self.body
             if isinstance(body_data, str):
                 body_data = body_data.encode()
-            
-            if 'Content-Length' not in self.headers:
-                writer.write(f'Content-Length: {len(body_data)}\r\n'.encode())
-            
-            writer.write(b'\r\n')
-            writer.write(body_data)
-            await writer.drain()
+            n = len(body_data)
+            extra = None if 'Content-Length' in self.headers else 'Content-Length: {}\r\n'.format(n)
+            head = self._head(extra)
+            if n <= CHUNK_SIZE:
+                # 小响应：头部与消息体合并为一次写出
+                writer.write(head + body_data)
+                await writer.drain()
+                return
+            writer.write(head)
+            mv = memoryview(body_data)
+            drainer = _Drainer(writer)
+            for i in range(0, n, CHUNK_SIZE):
+                writer.write(mv[i:i + CHUNK_SIZE])
+                await drainer.wrote(CHUNK_SIZE)
+            await drainer.flush()
 
 class Microdot:
+    """
+    路由表按注册时编译：
+    - 静态路径：dict 直接查找 {path: {method: handler}}
+    - 含参数路径（如 /api/poems/<int:id>）：按 '/' 分段的前缀树，
+      节点为 [字面子节点dict, 参数名, 参数子节点, 转换器, {method: handler}]
+    匹配到路径但方法不符时返回 405
+    """
+
+    # HTTP/1.1 长连接参数
+    keep_alive_timeout = 5       # 等待请求头的超时（秒），新连接的首个请求与长连接的后续请求均适用，超时则关闭
+    max_keep_alive_requests = 100  # 单个连接最多处理的请求数
+    max_keep_alive_conns = 4     # 同时保持的长连接上限，超出后的新连接处理完一个请求即关闭
+
+    # 请求体上限：普通路由整体读入内存；流式路由按块读取，可放宽上限
+    max_body_size = 614400               # 600KB
+    max_stream_body_size = 2 * 1024 * 1024  # 2MB
+    # 请求头上限
+    max_head_size = MAX_HEAD_SIZE
+    max_headers = MAX_HEADERS
+
     def __init__(self):
-        self.routes = []
+        self._static = {}
+        self._trie = [{}, None, None, None, None]
+        self._streaming = set()  # 以流式方式读取请求体的处理函数
+        self._keep_alive_conns = 0
+        self._startup = []       # 服务开始监听后以后台任务运行的协程函数
+        self.debug = False
 
-    def route(self, url, methods=['GET']):
+    def add_route(self, url, methods, f, stream=False):
+        """
+        注册路由；路径段 <name> 捕获字符串，<int:name> 捕获整数，作为关键字参数传给处理函数
+        stream=True 时不预读请求体，处理函数通过 request.stream（BodyStream）按块读取
+        """
+        if stream:
+            self._streaming.add(f)
+        if '<' not in url:
+            table = self._static.setdefault(url, {})
+        else:
+            node = self._trie
+            for seg in url.strip('/').split('/'):
+                if seg.startswith('<') and seg.endswith('>'):
+                    name = seg[1:-1]
+                    conv = None
+                    if ':' in name:
+                        conv, name = name.split(':', 1)
+                        if conv != 'int':
+                            raise ValueError('不支持的路径参数类型: ' + conv)
+                    if node[2] is None:
+                        node[1], node[2], node[3] = name, [{}, None, None, None, None], conv
+                    elif node[1] != name or node[3] != conv:
+                        raise ValueError('路径参数冲突: ' + url)
+                    node = node[2]
+                else:
+                    node = node[0].setdefault(seg, [{}, None, None, None, None])
+            if node[4] is None:
+                node[4] = {}
+            table = node[4]
+        for m in methods:
+            table[m] = f
+
+    def on_startup(self, f):
+        """注册启动任务（无参 async 函数，可用作装饰器）：服务开始监听后以后台任务运行，不阻塞接收连接"""
+        self._startup.append(f)
+        return f
+
+    def route(self, url, methods=['GET'], stream=False):
         def decorator(f):
-            self.routes.append((url, methods, f))
+            self.add_route(url, methods, f, stream)
             return f
         return decorator
 
+    def _match(self, node, segs, i, params):
+        """前缀树匹配（字面段优先，失败时回退尝试参数段）"""
+        if i == len(segs):
+            return node[4]
+        seg = segs[i]
+        child = node[0].get(seg)
+        if child is not None:
+            table = self._match(child, segs, i + 1, params)
+            if table is not None:
+                return table
+        if node[2] is not None and seg:
+            value = seg
+            if node[3] == 'int':
+                try:
+                    value = int(seg)
+                except ValueError:
+                    return None
+            table = self._match(node[2], segs, i + 1, params)
+            if table is not None:
+                params[node[1]] = value
+                return table
+        return None
+
+    def find_route(self, path):
+        """查找路径对应的 {method: handler} 和路径参数，未找到返回 (None, None)"""
+        table = self._static.get(path)
+        if table is not None:
+            return table, None
+        params = {}
+        table = self._match(self._trie, path.strip('/').split('/'), 0, params)
+        return table, params
+
     async def handle_request(self, reader, writer):
-        import gc
-        req = Request(reader)
-        # 提取客户端IP
+        """
+        连接处理：HTTP/1.1 长连接下循环处理同一连接上的多个请求（含管线化请求），
+        直到客户端要求关闭、空闲超时、达到单连接请求上限或出错
+        """
+        client_ip = ''
         try:
             peer = writer.get_extra_info('peername')
             if peer:
-                req.client_ip = peer[0]
+                client_ip = peer[0]
         except:
             pass
-        if not await req.read_request():
-            writer.close()
-            await writer.wait_closed()
-            return
-
-        handler = None
-        # Simple exact match for now, or prefix for static
-        for url, methods, f in self.routes:
-            if req.method in methods:
-                if url == req.path:
-                    handler = f
+        # 长连接名额有限，名额用尽时本连接只处理一个请求
+        persistent = self._keep_alive_conns < self.max_keep_alive_conns
+        if persistent:
+            self._keep_alive_conns += 1
+        conn = ConnReader(reader)
+        try:
+            served = 0
+            while True:
+                req = Request(conn)
+                req.client_ip = client_ip
+                try:
+                    # 首个请求同样限时，避免建立连接后不发送或缓慢发送请求头的客户端长期占用连接
+                    if not await req.read_head(self.keep_alive_timeout,
+                                               self.max_head_size, self.max_headers):
+                        break
+                except ValueError as e:
+                    # 请求头超限或请求行无法解析：回复错误并关闭连接
+                    code = e.args[0] if e.args and e.args[0] in _REASONS else 400
+                    await Response(_REASONS[code], code, {'Connection': 'close'}).write(writer)
+                    break
+                served += 1
+                keep_alive = persistent and served < self.max_keep_alive_requests and req.keep_alive()
+                # 先路由再读请求体：流式路由不预读，其余整体读入内存
+                table, params = self.find_route(req.path)
+                handler = table.get(req.method) if table else None
+                stream = handler is not None and handler in self._streaming
+                limit = self.max_stream_body_size if stream else self.max_body_size
+                if req.content_length() > limit:
+                    # 请求体过大：不读取，直接拒绝并关闭连接
+                    await Response('Payload Too Large', 413, {'Connection': 'close'}).write(writer)
                     break
-                # rudimentary wildcard for static files logic if implemented in handler
+                if stream:
+                    req.body = None
+                    req.stream = BodyStream(conn, req.content_length())
+                elif not await req.read_body(limit):
+                    break
+                keep_alive = await self.dispatch_request(req, writer, keep_alive, table, params)
+                if not keep_alive:
+                    break
+        except OSError:
+            pass # Connection reset by peer or closed prematurely
+        finally:
+            if persistent:
+                self._keep_alive_conns -= 1
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+    async def dispatch_request(self, req, writer, keep_alive, table, params):
+        """执行已路由的单个请求，写出响应；返回连接是否可继续复用"""
+        import gc
+        handler = table.get(req.method) if table else None
         
         if handler:
             try:
-                res = handler(req)
+                res = handler(req, **params) if params else handler(req)
                 # Check if it is a generator or an awaitable
                 # MicroPython's uasyncio check (simplified)
                 if hasattr(res, 'send') or hasattr(res, '__await__'): # Check if coroutine/generator
@@ -177,6 +652,8 @@ class Microdot:
                 import sys
                 sys.print_exception(e)
                 res = Response('Internal Server Error', 500)
+        elif table:
+            res = Response('Method Not Allowed', 405, {'Allow': ', '.join(table)})
         else:
             res = Response('Not Found', 404)
 
@@ -189,9 +666,13 @@ class Microdot:
         if res is None:
             res = Response('', 204)
         
+        # 流式请求体未读完时，连接上剩余的数据无法区分请求边界，响应后关闭
+        if req.stream is not None and req.stream.remaining > 0:
+            keep_alive = False
         # 释放请求体内存，防止大请求累积
         req.body = None
         req.json = None
+        req.stream = None
         gc.collect()
             
         # 注入安全响应头
@@ -201,21 +682,38 @@ class Microdot:
         if req.path.startswith('/api'):
             res.headers['Cache-Control'] = 'no-store'
         
-        try:
-            await res.write(writer)
-            writer.close()
-            await writer.wait_closed()
-        except OSError:
-            pass # Connection reset by peer or closed prematurely
+        # 流式消息体：HTTP/1.1 使用分块编码，HTTP/1.0 只能以关闭连接标识结束
+        if res.is_stream():
+            res.headers.pop('Content-Length', None)
+            if req.version == 'HTTP/1.1':
+                res.headers['Transfer-Encoding'] = 'chunked'
+            else:
+                keep_alive = False
+        # 文件流响应未声明长度时只能以关闭连接标识结束
+        elif hasattr(res.body, 'read') and 'Content-Length' not in res.headers:
+            keep_alive = False
+        if keep_alive:
+            res.headers['Connection'] = 'keep-alive'
+            res.headers['Keep-Alive'] = 'timeout={}'.format(self.keep_alive_timeout)
+        else:
+            res.headers['Connection'] = 'close'
+        
+        if self.debug:
+            print(f'{req.method} {req.path} -> {res.status_code}')
+        await res.write(writer)
         
         # 请求完成后再次释放内存
         gc.collect()
+        return keep_alive
 
 
-    def run(self, host='0.0.0.0', port=80):
+    def run(self, host='0.0.0.0', port=80, debug=False):
+        self.debug = debug
         async def main():
             print(f'Starting web server on {host}:{port}...')
             server = await asyncio.start_server(self.handle_request, host, port)
+            for f in self._startup:
+                asyncio.create_task(f())
             while True:
                 await asyncio.sleep(3600)
         
@@ -224,7 +722,67 @@ class Microdot:
         except KeyboardInterrupt:
             pass
 
-def send_file(filename, content_type=None):
+# 可压缩的文本类型（存在 .gz 预压缩副本时优先发送）
+COMPRESSIBLE_TYPES = ('text/html', 'text/css', 'application/javascript')
+# 静态文件缓存策略：允许缓存但每次需向设备验证（命中时返回 304，无需重传）
+STATIC_CACHE_CONTROL = 'no-cache'
+
+_WEEKDAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+_MONTHS = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+# 已格式化的验证器缓存 {path: (size, mtime, etag, last_modified)}，文件变化时重新生成
+_validators = {}
+
+def _stat(path):
+    try:
+        import os
+        return os.stat(path)
+    except OSError:
+        return None
+
+def http_date(t):
+    """格式化为 HTTP 日期（如 Wed, 21 Oct 2015 07:28:00 GMT）"""
+    import time
+    tm = time.gmtime(t)
+    return '{}, {:02d} {} {:04d} {:02d}:{:02d}:{:02d} GMT'.format(
+        _WEEKDAYS[tm[6]], tm[2], _MONTHS[tm[1] - 1], tm[0], tm[3], tm[4], tm[5])
+
+def _file_validators(path, stat):
+    """获取文件的 ETag 与 Last-Modified（按 大小-修改时间 生成，缓存格式化结果）"""
+    size, mtime = stat[6], stat[8]
+    v = _validators.get(path)
+    if v is None or v[0] != size or v[1] != mtime:
+        # 压缩副本使用不同的 ETag，避免与原文件的缓存混淆
+        etag = '"{:x}-{:x}{}"'.format(size, mtime, '-gz' if path.endswith('.gz') else '')
+        v = (size, mtime, etag, http_date(mtime))
+        _validators[path] = v
+    return v[2], v[3]
+
+def _not_modified(request, etag, last_modified):
+    """判断条件请求是否命中（If-None-Match 优先于 If-Modified-Since）"""
+    inm = request.headers.get('if-none-match')
+    if inm is not None:
+        if inm.strip() == '*':
+            return True
+        for tag in inm.split(','):
+            tag = tag.strip()
+            if tag.startswith('W/'):
+                tag = tag[2:]
+            if tag == etag:
+                return True
+        return False
+    # 只比对本设备下发的日期字符串，省去日期解析
+    return request.headers.get('if-modified-since') == last_modified
+
+def send_file(filename, content_type=None, request=None, cache_control=STATIC_CACHE_CONTROL, file_cache=None):
+    """
+    发送静态文件（流式）
+    传入 request 且客户端声明 Accept-Encoding: gzip 时，若存在不旧于源文件的
+    filename + '.gz' 预压缩副本（由 tools/build_static.py 生成），则直接发送该副本
+    响应附带 ETag / Last-Modified，条件请求命中时返回 304 不重传文件
+    cache_control 可覆盖默认缓存策略（如内容哈希地址使用 immutable 长期缓存）
+    file_cache 为可选的内存文件缓存，需提供 get(path, etag) / admit(size) / put(path, etag, data)；
+    命中时直接发送内存中的 bytes，不读取闪存；未命中时 admit 为真才整体读入并缓存，否则流式发送
+    """
     if not content_type:
         if filename.endswith('.html'): content_type = 'text/html'
         elif filename.endswith('.css'): content_type = 'text/css'
@@ -232,12 +790,105 @@ def send_file(filename, content_type=None):
         elif filename.endswith('.png'): content_type = 'image/png'
         elif filename.endswith('.jpg'): content_type = 'image/jpeg'
         else: content_type = 'text/plain'
-        
+    
+    headers = {'Content-Type': content_type}
+    stat = _stat(filename)
+    path = filename
+    if content_type in COMPRESSIBLE_TYPES:
+        headers['Vary'] = 'Accept-Encoding'
+        if request is not None and 'gzip' in request.headers.get('accept-encoding', ''):
+            gz_stat = _stat(filename + '.gz')
+            # 源文件更新后未重新生成的 .gz 视为过期，回退发送源文件
+            if gz_stat is not None and (stat is None or gz_stat[8] >= stat[8]):
+                stat = gz_stat
+                path = filename + '.gz'
+                headers['Content-Encoding'] = 'gzip'
+    if stat is None:
+        return Response('File not found', 404)
+    etag, last_modified = _file_validators(path, stat)
+    headers['ETag'] = etag
+    headers['Last-Modified'] = last_modified
+    headers['Cache-Control'] = cache_control
+    if request is not None and _not_modified(request, etag, last_modified):
+        del headers['Content-Type']
+        headers.pop('Content-Encoding', None)
+        return Response('', 304, headers)
+    headers['Content-Length'] = str(stat[6])
+    if file_cache is not None:
+        data = file_cache.get(path, etag)
+        if data is not None:
+            return Response(data, headers=headers)
     try:
-        import os
-        stat = os.stat(filename)
-        size = stat[6]
-        f = open(filename, 'rb')
-        return Response(f, headers={'Content-Type': content_type, 'Content-Length': str(size)})
+        f = open(path, 'rb')
     except OSError:
         return Response('File not found', 404)
+    if file_cache is not None and file_cache.admit(stat[6]):
+        # 小文件整体读入内存后缓存，后续请求直接从内存发送
+        try:
+            data = f.read()
+        finally:
+            f.close()
+        file_cache.put(path, etag, data)
+        return Response(data, headers=headers)
+    return Response(f, headers=headers)
+
+
+class JsonArrayStream:
+    """
+    将记录序列流式编码为 JSON 数组（配合分块编码响应，内存占用与总数据量无关）
+    source 可为普通迭代器或异步迭代器（如 JsonlDB.aiter_records()）；
+    transform(item) 返回要输出的对象，返回 None 表示跳过该条
+    多条记录合并到约 chunk_size 字节后再产出，减少分块数量
+    """
+
+    def __init__(self, source, transform=None, chunk_size=1024):
+        self._async = hasattr(source, '__anext__')
+        self._src = source if self._async else iter(source)
+        self._transform = transform
+        self._chunk_size = chunk_size
+        self._started = False
+        self._first = True
+        self._done = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        import json
+        if self._done:
+            raise StopAsyncIteration
+        parts = []
+        size = 0
+        if not self._started:
+            self._started = True
+            parts.append('[')
+        while size < self._chunk_size:
+            try:
+                item = await self._src.__anext__() if self._async else next(self._src)
+            except (StopIteration, StopAsyncIteration):
+                self._done = True
+                parts.append(']')
+                break
+            if self._transform is not None:
+                item = self._transform(item)
+                if item is None:
+                    continue
+            s = json.dumps(item)
+            if not self._first:
+                parts.append(',')
+            self._first = False
+            parts.append(s)
+            size += len(s)
+        return ''.join(parts)
+
+    def close(self):
+        try:
+            self._src.close()
+        except:
+            pass
+
+
+def stream_json_array(source, transform=None, status_code=200):
+    """构造流式 JSON 数组响应（Transfer-Encoding: chunked）"""
+    return Response(JsonArrayStream(source, transform), status_code,
+                    {'Content-Type': 'application/json'})
@@ -7,19 +7,21 @@ try:
     import network
     import time
     import machine
-    from lib.microdot import Microdot, Response, send_file
+    import uasyncio as asyncio
+    from lib.microdot import Microdot, Response, send_file, stream_json_array
     from lib.Logger import log, debug, info, warn, error
     from lib.Watchdog import watchdog
     from lib.SystemStatus import status_led
-    from lib.CacheManager import cache
+    from lib.CacheManager import cache, PRIORITY_LOW, PRIORITY_HIGH, PRIORITY_PINNED
     from lib.Validator import (validate_phone, validate_password_strength,
         validate_name, validate_alias, validate_birthday,
         validate_points, validate_custom_fields)
-    from lib.JsonlDB import JsonlDB
+    from lib.JsonlDB import JsonlDB, Pacer
+    from lib.JsonStream import JsonRecordStream
     from lib.Settings import (get_settings, save_settings,
         invalidate_settings_cache, SETTINGS_KEYS, DEFAULT_TOKEN_EXPIRE_DAYS)
     from lib.Auth import (hash_password, verify_password, generate_token,
-        verify_token, check_token, extract_token, simple_unquote)
+        check_token, extract_token, auth_context, simple_unquote)
     info("main.py 模块导入成功", "Init")
 except ImportError as e:
     print(f"\n[CRITICAL] 导入失败: {e}")
@@ -32,10 +34,19 @@ cache.register('runtime:start_time', ctype='const', initial=time.time())
 LOW_MEMORY_THRESHOLD = 51200  # 50KB
 
 def _check_low_memory():
-    """检查内存水位，低于阈值时紧急释放所有非常量缓存"""
-    if gc.mem_free() < LOW_MEMORY_THRESHOLD:
-        warn(f"内存不足({gc.mem_free()}B < {LOW_MEMORY_THRESHOLD}B)，触发缓存紧急释放", "Memory")
-        cache.flush_all()
+    """
+    检查内存水位，低于阈值时按优先级淘汰缓存（重建成本低的先淘汰），
+    释放后仍不足时才紧急释放所有非常量缓存
+    """
+    free = gc.mem_free()
+    if free < LOW_MEMORY_THRESHOLD:
+        freed = cache.shrink(LOW_MEMORY_THRESHOLD - free)
+        gc.collect()
+        if gc.mem_free() < LOW_MEMORY_THRESHOLD:
+            warn(f"内存不足({gc.mem_free()}B < {LOW_MEMORY_THRESHOLD}B)，触发缓存紧急释放", "Memory")
+            cache.flush_all()
+        else:
+            info(f"内存不足({free}B)，已按优先级淘汰缓存约{freed}B", "Memory")
 
 # 看门狗定时喂狗器（防止空闲超时）
 _watchdog_timer = None
@@ -119,41 +130,42 @@ def stop_wifi_monitor():
 app = Microdot()
 
 # --- API 响应缓存（页面第一页数据） ---
-# 页面列表类缓存：TTL 600秒（10分钟兜底，写入时精确失效）
-for _ck in ['api:poems:page1', 'api:activities:page1', 'api:tasks:page1',
-            'api:members:page1', 'api:finance:page1']:
-    cache.register(_ck, ctype='value', ttl=600)
-# 统计/聚合类缓存：TTL 300秒（5分钟兜底）
-for _ck in ['api:finance:stats', 'api:points:ranking', 'api:system:stats']:
-    cache.register(_ck, ctype='value', ttl=300)
-del _ck
+# 各缓存以 depends 声明依赖的数据表，JsonlDB 写入后自动失效，业务代码无需手动失效
+
+def _count_changed(old, new):
+    """新增或删除记录（记录数变化）；更新不影响计数类缓存"""
+    return old is None or new is None
+
+# 页面列表类缓存（api:*:page1）在数据库初始化后注册，见 _page1_loader
+# 每日一诗：值为 {date, poem}，按日期自行判断是否过期
+# 新增诗词不失效（保持当天选中的诗词不变），被选中的诗词可能被修改或删除时失效
+cache.register('api:poems:daily', ctype='value', priority=PRIORITY_LOW,
+               depends={'poems': lambda old, new: old is not None})
+# 静态资源哈希清单：{哈希文件名: 原文件名}，首次访问时从 static/manifest.json 加载
+cache.register('static:manifest', ctype='value')
+# 静态文件内存缓存：{路径: (etag, bytes)}，LRUDict 维护访问顺序，按字节预算淘汰
+cache.register('static:files', ctype='dict', max_size=16, priority=PRIORITY_LOW)
+# 统计/聚合类缓存：TTL 300秒（5分钟兜底），在各自的加载函数处注册
+# 财务统计与年度排行需全表扫描，使用 swr 模式
 info("API响应缓存已注册", "Cache")
 
-def invalidate_api_cache(*keys):
-    """批量失效 API 响应缓存"""
-    for k in keys:
-        cache.invalidate(k)
-
-def _invalidate_weekly_cache():
-    """清除所有已注册的周统计缓存"""
-    for k in list(cache._cfg.keys()):
-        if k.startswith('api:weekly:'):
-            cache.invalidate(k)
-
-def invalidate_module_cache(module):
-    """按模块失效全部相关 API 缓存（备份导入用）"""
-    m = {
-        'poems': ['api:poems:page1', 'api:system:stats'],
-        'activities': ['api:activities:page1', 'api:system:stats'],
-        'tasks': ['api:tasks:page1', 'api:system:stats'],
-        'members': ['api:members:page1', 'api:points:ranking', 'api:system:stats'],
-        'finance': ['api:finance:page1', 'api:finance:stats', 'api:system:stats'],
-        'points_logs': ['api:points:ranking'],
-    }
-    for k in m.get(module, []):
-        cache.invalidate(k)
-    if module in ('poems', 'activities'):
-        _invalidate_weekly_cache()
+def _weekly_cache(year):
+    """
+    按年份注册周统计缓存，只依赖该年份的诗词与活动（按 date 年份限定键范围）
+    swr 模式：过期后先返回旧统计，后台重新扫描
+    """
+    cache_key = 'api:weekly:{}'.format(year)
+    if cache_key not in cache._cfg:
+        prefix = str(year)
+        def in_year(old, new):
+            return ((old is not None and (old.get('date') or '')[:4] == prefix)
+                    or (new is not None and (new.get('date') or '')[:4] == prefix))
+        async def load():
+            return await _load_weekly_stats(year)
+        cache.register(cache_key, ctype='value', ttl=3600,
+                       depends={'poems': in_year, 'activities': in_year},
+                       loader=load, swr=True)
+    return cache_key
 
 # 维护模式白名单（这些接口即使在维护模式下也可访问）
 MAINTENANCE_WHITELIST = [
@@ -165,6 +177,7 @@ MAINTENANCE_WHITELIST = [
 PUBLIC_DATA_WHITELIST = [
     '/api/poems',
     '/api/poems/random',
+    '/api/poems/<int:pid>',
     '/api/poems/weekly-stats',
     '/api/activities',
     '/api/members',
@@ -178,11 +191,19 @@ PUBLIC_DATA_WHITELIST = [
 _RESP_MAINTENANCE = Response('{"error": "系统维护中，请稍后再试"}', 503, {'Content-Type': 'application/json'})
 _RESP_GUEST_DENIED = Response('{"error": "请先登录后访问"}', 401, {'Content-Type': 'application/json'})
 
-def api_route(url, methods=['GET']):
+async def _flash_after(coro):
+    """等待异步处理函数完成后触发LED快闪"""
+    result = await coro
+    status_led.flash_once()
+    return result
+
+def api_route(url, methods=['GET'], stream=False):
     """
     API路由装饰器，包装原生route装饰器
     在API请求处理完成后自动触发LED快闪和看门狗喂狗
-    支持路径参数（如 /api/backup/table/<table>）
+    支持路径参数（如 /api/poems/<int:pid>），以关键字参数传入处理函数
+    支持 async def 处理函数（长扫描类接口使用 JsonlDB 异步方法分段让出）
+    stream=True 时请求体不预读，处理函数通过 request.stream 按块读取（大文件上传/导入）
     包含维护模式检查和游客访问控制
     """
     def decorator(f):
@@ -190,28 +211,31 @@ def api_route(url, methods=['GET']):
             watchdog.feed()  # 每次API请求时喂狗
             
             # 维护模式和游客访问检查（白名单接口除外）
+            # 操作者身份仅在开关关闭时才需要，按需解析并缓存到请求上下文
             if url not in MAINTENANCE_WHITELIST:
                 s = get_settings()
-                user_id, role = get_operator_role(request)
                 
                 # 网站访问检查（site_open=false时仅管理员可访问）
                 if not s.get('site_open', True):
-                    if role not in ['super_admin', 'admin']:
+                    if get_operator_role(request)[1] not in ['super_admin', 'admin']:
                         return _RESP_MAINTENANCE
                 
                 # 游客访问控制（未登录用户）
                 # 公开数据接口的GET请求允许访问（前端已处理登录跳转）
-                is_get_request = request.method == 'GET'
-                is_public_data = url in PUBLIC_DATA_WHITELIST
-                if not s.get('allow_guest', True) and not user_id:
-                    if not (is_get_request and is_public_data):
+                if not s.get('allow_guest', True):
+                    is_get_request = request.method == 'GET'
+                    is_public_data = url in PUBLIC_DATA_WHITELIST
+                    if not (is_get_request and is_public_data) and not get_operator_role(request)[0]:
                         return _RESP_GUEST_DENIED
             
             result = f(request, *args, **kwargs)
+            # 异步处理函数：返回协程，由 Microdot 等待完成后再快闪
+            if hasattr(result, 'send'):
+                return _flash_after(result)
             status_led.flash_once()  # API响应后LED快闪
             return result
         # 注册到microdot路由
-        app.routes.append((url, methods, wrapper))
+        app.add_route(url, methods, wrapper, stream)
         return wrapper
     return decorator
 
@@ -220,10 +244,31 @@ def api_route(url, methods=['GET']):
 db_poems = JsonlDB('data/poems.jsonl')
 db_members = JsonlDB('data/members.jsonl')
 db_activities = JsonlDB('data/activities.jsonl')
-db_finance = JsonlDB('data/finance.jsonl')
+# 财务与日志表不按ID单条读取，不启用记录缓存
+db_finance = JsonlDB('data/finance.jsonl', record_cache_size=0)
 db_tasks = JsonlDB('data/tasks.jsonl')
-db_login_logs = JsonlDB('data/login_logs.jsonl')
-db_points_logs = JsonlDB('data/points_logs.jsonl')
+db_login_logs = JsonlDB('data/login_logs.jsonl', record_cache_size=0)
+db_points_logs = JsonlDB('data/points_logs.jsonl', record_cache_size=0)
+
+def _page1_loader(db, limit, reverse, strip_password=False):
+    """第一页列表缓存的加载函数：异步读取（重建行偏移索引时让出），并发未命中由 cache.fetch 合并"""
+    async def load():
+        items, _ = await db.afetch_page(1, limit, reverse=reverse)
+        if strip_password:
+            for m in items:
+                m.pop('password', None)
+        return items
+    return load
+
+# 页面列表类缓存：TTL 600秒（10分钟兜底，写入时精确失效）
+for _ck, _db, _limit, _reverse in [('api:poems:page1', db_poems, 10, True),
+                                   ('api:activities:page1', db_activities, 10, True),
+                                   ('api:tasks:page1', db_tasks, 10, True),
+                                   ('api:members:page1', db_members, 10, False),
+                                   ('api:finance:page1', db_finance, 20, True)]:
+    cache.register(_ck, ctype='value', ttl=600, priority=PRIORITY_LOW, depends=_db.table,
+                   loader=_page1_loader(_db, _limit, _reverse, _db is db_members))
+del _ck, _db, _limit, _reverse
 
 def get_current_time():
     """获取当前时间字符串 (ISO格式近似)"""
@@ -300,37 +345,37 @@ def can_manage_member(operator_id, operator_role, target_member_id, target_membe
     return True, None
 
 # 用户角色缓存 {user_id: role}，避免每次请求都扫描members文件
-# TTL=1800秒(30分钟)自动过期，max_size=50防止无界增长
-cache.register('role', ctype='dict', ttl=1800, max_size=50)
-
-def invalidate_role_cache(user_id=None):
-    """清除角色缓存。user_id为None时清除全部，否则清除指定用户"""
-    cache.invalidate('role', key=user_id)
+# 每个条目写入30分钟后各自过期（不会整槽同时失效），max_size=50按LRU淘汰
+# 成员记录变更时只失效该成员的条目（导入等整表变更时全部失效）
+cache.register('role', ctype='dict', ttl=1800, max_size=50, priority=PRIORITY_HIGH,
+               depends={'members': 'id'})
 
 def get_operator_role(request):
     """
     从请求中获取操作者角色（通过Token验证）
     返回: (user_id, role) 或 (None, None)
-    优先从缓存读取角色，未命中时按ID查找单条记录
+    结果保存在 request.g['operator']，同一请求内的装饰器与处理函数不再重复验证和查找
     """
+    operator = request.g.get('operator')
+    if operator is None:
+        operator = _resolve_operator(request)
+        request.g['operator'] = operator
+    return operator
+
+def _resolve_operator(request):
+    """验证Token并查找角色：优先从缓存读取角色，未命中时按ID查找单条记录"""
     try:
-        token = extract_token(request)
-        
-        if not token:
-            return None, None
-        
-        valid, user_id, err_msg = verify_token(token)
+        valid, user_id, err_msg = auth_context(request)
         if valid and user_id:
             # 优先查缓存
-            role_store = cache.store('role')
-            if user_id in role_store:
-                return user_id, role_store[user_id]
+            role = cache.get('role', user_id)
+            if role is not None:
+                return user_id, role
             # 缓存未命中，按ID精确查找
             member = db_members.get_by_id(user_id)
             if member:
                 role = member.get('role', 'member')
-                role_store[user_id] = role
-                cache.enforce_max_size('role')
+                cache.put('role', user_id, role)
                 return user_id, role
     except Exception as e:
         debug(f"获取操作者角色失败: {e}", "Auth")
@@ -346,12 +391,10 @@ def require_login(f):
     用法：@require_login
     """
     def wrapper(request, *args, **kwargs):
-        token = extract_token(request)
-        
-        if not token:
+        if not extract_token(request):
             return Response('{"error": "请先登录"}', 401, {'Content-Type': 'application/json'})
         
-        valid, user_id, err_msg = verify_token(token)
+        valid, user_id, err_msg = auth_context(request)
         if not valid:
             return Response(json.dumps({"error": err_msg}), 401, {'Content-Type': 'application/json'})
         
@@ -387,7 +430,7 @@ def check_permission(request, allowed_roles):
 def record_points_change(member_id, member_name, change, reason):
     """记录积分变动日志"""
     log = {
-        'id': db_points_logs.get_max_id() + 1,
+        'id': db_points_logs.next_id(),
         'member_id': member_id,
         'member_name': member_name,
         'change': change,
@@ -395,12 +438,11 @@ def record_points_change(member_id, member_name, change, reason):
         'timestamp': get_current_time()
     }
     db_points_logs.append(log)
-    invalidate_api_cache('api:points:ranking')
 
 def record_login_log(member_id, member_name, phone, status, ip=''):
     """记录登录日志"""
     log = {
-        'id': db_login_logs.get_max_id() + 1,
+        'id': db_login_logs.next_id(),
         'member_id': member_id,
         'member_name': member_name,
         'phone': phone[:3] + '****' + phone[-4:] if len(phone) >= 7 else phone,
@@ -422,6 +464,7 @@ def record_login_log(member_id, member_name, phone, status, ip=''):
                     f.write(json.dumps(l) + '\n')
             os.remove(db_login_logs.filepath)
             os.rename(tmp_path, db_login_logs.filepath)
+            db_login_logs.invalidate_cache()
     except Exception as e:
         debug(f"清理登录日志失败: {e}", "Log")
     gc.collect()
@@ -449,21 +492,79 @@ def print_system_status():
 # ==============================================================================
 
 @app.route('/')
-def index(request): return send_file('static/index.html')
-@app.route('/static/style.css')
-def style(request): return send_file('static/style.css')
-@app.route('/static/app.js')
-def app_js(request): return send_file('static/app.js')
-@app.route('/static/logo.png')
-def logo_png(request): return send_file('static/logo.png')
-@app.route('/static/marked.umd.js')
-def marked_js(request): return send_file('static/marked.umd.js')
-@app.route('/static/purify.min.js')
-def purify_js(request): return send_file('static/purify.min.js')
+def index(request): return send_file('static/index.html', request=request, file_cache=_static_ram)
+
+# 可通过 /static/<name> 访问的静态资源白名单
+STATIC_ASSETS = ('style.css', 'app.js', 'logo.png', 'marked.umd.js', 'purify.min.js')
+# 带内容哈希的资源地址内容永不变化，允许浏览器长期缓存且不再验证
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# 静态文件内存缓存：总字节预算与单文件上限（超过上限的文件始终从闪存流式发送）
+STATIC_RAM_BUDGET = 96 * 1024
+STATIC_RAM_MAX_FILE = 48 * 1024
+
+class StaticRamCache:
+    """
+    热点小静态文件的内存缓存（按字节预算的 LRU）
+    数据存放在缓存槽 'static:files' {路径: (etag, bytes)}，
+    flush_all / 低内存清理时随其他缓存一并释放
+    """
+    max_file = STATIC_RAM_MAX_FILE
+
+    def get(self, path, etag):
+        ent = cache.get('static:files', path)
+        # ETag 不一致说明文件已更新，丢弃旧内容
+        if ent is None or ent[0] != etag:
+            return None
+        return ent[1]
+
+    def admit(self, size):
+        """读入文件前判断是否缓存：超过单文件上限或内存不足时不缓存（保留余量给业务请求），改为流式发送"""
+        return size <= self.max_file and gc.mem_free() >= size + LOW_MEMORY_THRESHOLD
+
+    def put(self, path, etag, data):
+        cache.put('static:files', path, (etag, data))
+        d = cache.peek('static:files')
+        total = 0
+        for ent in d.values():
+            total += len(ent[1])
+        # 超出字节预算时从最久未使用的条目开始淘汰
+        while total > STATIC_RAM_BUDGET and d:
+            total -= len(d.popitem()[1][1])
+
+_static_ram = StaticRamCache()
+
+def _hashed_assets():
+    """
+    读取部署时生成的 static/manifest.json（{原文件名: 哈希文件名}），
+    返回反向映射 {哈希文件名: 原文件名}；未部署清单时为空字典
+    """
+    hashed = cache.get_val('static:manifest')
+    if hashed is None:
+        hashed = {}
+        try:
+            with open('static/manifest.json', 'r') as f:
+                for name, hname in json.load(f).items():
+                    if name in STATIC_ASSETS:
+                        hashed[hname] = name
+        except Exception:
+            pass  # 未执行 tools/build_static.py，使用普通地址
+        cache.set_val('static:manifest', hashed)
+    return hashed
+
+@app.route('/static/<name>')
+def static_asset(request, name):
+    """静态资源：哈希地址（如 app.1a2b3c4d.js）按清单映射到原文件并长期缓存"""
+    if name in STATIC_ASSETS:
+        return send_file('static/' + name, request=request, file_cache=_static_ram)
+    orig = _hashed_assets().get(name)
+    if orig is None:
+        return Response('Not Found', 404)
+    return send_file('static/' + orig, request=request, cache_control=IMMUTABLE_CACHE_CONTROL,
+                     file_cache=_static_ram)
 
 # --- Poems API ---
 @api_route('/api/poems', methods=['GET'])
-def list_poems(request):
+async def list_poems(request):
     # args: page=1, limit=10, q=...
     try:
         page = int(request.args.get('page', 1))
@@ -473,13 +574,8 @@ def list_poems(request):
             q = simple_unquote(q)
         # 默认第一页且无搜索：走缓存
         if page == 1 and limit == 10 and not q:
-            cached = cache.get_val('api:poems:page1')
-            if cached is not None:
-                return cached
-            items, _ = db_poems.fetch_page(1, 10, reverse=True)
-            cache.set_val('api:poems:page1', items)
-            return items
-        items, _ = db_poems.fetch_page(page, limit, reverse=True, search_term=q)
+            return await cache.fetch('api:poems:page1')
+        items, _ = await db_poems.afetch_page(page, limit, reverse=True, search_term=q)
         return items
     except Exception as e:
         error(f"获取诗歌列表失败: {e}", "API")
@@ -487,78 +583,93 @@ def list_poems(request):
 
 @api_route('/api/poems/random', methods=['GET'])
 def random_poem(request):
-    """获取随机一首诗词（用于今日推荐）"""
+    """获取随机一首诗词（用于今日推荐）
+    参数 daily=1 时返回确定性的"每日一诗"（当天内固定，计算一次后缓存）
+    """
     try:
-        import urandom
         total = db_poems.count()
         if total == 0:
             return {}  # 无数据时返回空对象
-        # 生成随机索引
-        random_index = urandom.getrandbits(16) % total
-        # 读取该位置的诗词
-        count = 0
-        with open(db_poems.filepath, 'r') as f:
-            for line in f:
-                if count == random_index:
-                    return json.loads(line)
-                count += 1
-        return {}  # 未找到时返回空对象
+        if request.args.get('daily') == '1':
+            return _poem_of_the_day(total)
+        import urandom
+        # 30位随机数取模（16位在超过65536首时无法覆盖全部诗词）
+        random_index = urandom.getrandbits(30) % total
+        # 通过行偏移索引直接定位该序号的诗词
+        return db_poems.get_by_ordinal(random_index) or {}
     except Exception as e:
         error(f"获取随机诗歌失败: {e}", "API")
         return {}  # 异常时返回空对象
 
+def _poem_of_the_day(total):
+    """每日一诗：按日期确定性选取，同一天内从缓存返回"""
+    t = time.localtime()
+    today = "{:04d}-{:02d}-{:02d}".format(t[0], t[1], t[2])
+    cached = cache.get_val('api:poems:daily')
+    if cached is not None and cached.get('date') == today:
+        return cached['poem']
+    # 日期序号乘以黄金分割常数取模，使相邻日期的选择分散
+    day_seed = t[0] * 372 + t[1] * 31 + t[2]
+    poem = db_poems.get_by_ordinal((day_seed * 2654435761) % total) or {}
+    cache.set_val('api:poems:daily', {'date': today, 'poem': poem})
+    return poem
+
+@api_route('/api/poems/<int:pid>', methods=['GET'])
+def get_poem(request, pid):
+    """按ID获取单首诗词（优先读取记录缓存）"""
+    poem = db_poems.get_by_id(pid)
+    if not poem:
+        return Response('{"error": "作品不存在"}', 404, {'Content-Type': 'application/json'})
+    return poem
+
 @api_route('/api/poems/weekly-stats', methods=['GET'])
-def weekly_poem_stats(request):
+async def weekly_poem_stats(request):
     """获取年度诗词周统计（流式计算，内存友好，支持缓存）"""
     try:
         year = int(request.args.get('year', time.localtime()[0]))
         # 按年份动态注册缓存
-        cache_key = 'api:weekly:{}'.format(year)
-        if cache_key not in cache._cfg:
-            cache.register(cache_key, ctype='value', ttl=3600)
-        cached = cache.get_val(cache_key)
-        if cached is not None:
-            return cached
-        days_in_months = [0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
-        if (year % 4 == 0 and year % 100 != 0) or (year % 400 == 0):
-            days_in_months[2] = 29
-        weeks = [0] * 52
-        for poem in db_poems.iter_records():
-            d = poem.get('date', '')
-            if not d or len(d) < 10:
-                continue
-            try:
-                if int(d[:4]) != year:
-                    continue
-                m, dy = int(d[5:7]), int(d[8:10])
-                doy = sum(days_in_months[:m]) + dy
-                w = min((doy - 1) // 7, 51)
-                weeks[w] += 1
-            except:
-                pass
-        act_weeks = []
-        for act in db_activities.iter_records():
-            d = act.get('date', '')
-            if not d or len(d) < 10:
-                continue
-            try:
-                if int(d[:4]) != year:
-                    continue
-                m, dy = int(d[5:7]), int(d[8:10])
-                doy = sum(days_in_months[:m]) + dy
-                w = min((doy - 1) // 7, 51)
-                if w not in act_weeks:
-                    act_weeks.append(w)
-            except:
-                pass
-        gc.collect()
-        result = {'year': year, 'weeks': weeks, 'act_weeks': act_weeks}
-        cache.set_val(cache_key, result)
-        return result
+        return await cache.fetch(_weekly_cache(year))
     except Exception as e:
         error(f"获取诗词周统计失败: {e}", "API")
         return {'year': 0, 'weeks': [0] * 52, 'act_weeks': []}
 
+async def _load_weekly_stats(year):
+    """扫描诗词与活动，计算指定年份每周的作品数与有活动的周"""
+    days_in_months = [0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+    if (year % 4 == 0 and year % 100 != 0) or (year % 400 == 0):
+        days_in_months[2] = 29
+    weeks = [0] * 52
+    async for poem in db_poems.aiter_records():
+        d = poem.get('date', '')
+        if not d or len(d) < 10:
+            continue
+        try:
+            if int(d[:4]) != year:
+                continue
+            m, dy = int(d[5:7]), int(d[8:10])
+            doy = sum(days_in_months[:m]) + dy
+            w = min((doy - 1) // 7, 51)
+            weeks[w] += 1
+        except:
+            pass
+    act_weeks = []
+    async for act in db_activities.aiter_records():
+        d = act.get('date', '')
+        if not d or len(d) < 10:
+            continue
+        try:
+            if int(d[:4]) != year:
+                continue
+            m, dy = int(d[5:7]), int(d[8:10])
+            doy = sum(days_in_months[:m]) + dy
+            w = min((doy - 1) // 7, 51)
+            if w not in act_weeks:
+                act_weeks.append(w)
+        except:
+            pass
+    gc.collect()
+    return {'year': year, 'weeks': weeks, 'act_weeks': act_weeks}
+
 @api_route('/api/poems', methods=['POST'])
 @require_login
 def create_poem(request):
@@ -574,21 +685,17 @@ def create_poem(request):
     if user_id:
         data['author_id'] = user_id
     
-    new_id = db_poems.get_max_id() + 1
+    new_id = db_poems.next_id()
     data['id'] = new_id
     if 'date' not in data: data['date'] = '2026-01-01'
     
     if db_poems.append(data):
-        year = data.get('date', '')[:4]
-        invalidate_api_cache('api:poems:page1', 'api:system:stats')
-        if year:
-            cache.invalidate('api:weekly:{}'.format(year))
         return data
     return Response('Write Failed', 500)
 
 @api_route('/api/poems/update', methods=['POST'])
 @require_login
-def update_poem(request):
+async def update_poem(request):
     if not request.json: return Response('Invalid', 400)
     data = request.json
     pid = data.get('id')
@@ -613,11 +720,7 @@ def update_poem(request):
         if 'type' in data: record['type'] = data['type']
         if 'date' in data: record['date'] = data['date']
         
-    if db_poems.update(pid, updater):
-        invalidate_api_cache('api:poems:page1')
-        year = data.get('date', poem.get('date', ''))[:4]
-        if year:
-            cache.invalidate('api:weekly:{}'.format(year))
+    if await db_poems.aupdate(pid, updater):
         return {"status": "success"}
     return Response("Poem not found", 404)
 
@@ -636,14 +739,12 @@ def delete_poem(request):
         return Response('{"error": "只能删除自己的作品"}', 403, {'Content-Type': 'application/json'})
     
     if db_poems.delete(pid):
-        invalidate_api_cache('api:poems:page1', 'api:system:stats')
-        _invalidate_weekly_cache()
         return {"status": "success"}
     return Response("Poem not found", 404)
 
 # --- Activities API ---
 @api_route('/api/activities', methods=['GET'])
-def list_activities(request):
+async def list_activities(request):
     try:
         page = int(request.args.get('page', 1))
         limit = int(request.args.get('limit', 10))
@@ -651,13 +752,8 @@ def list_activities(request):
         if q: q = simple_unquote(q)
         # 默认第一页且无搜索：走缓存
         if page == 1 and limit == 10 and not q:
-            cached = cache.get_val('api:activities:page1')
-            if cached is not None:
-                return cached
-            items, _ = db_activities.fetch_page(1, 10, reverse=True)
-            cache.set_val('api:activities:page1', items)
-            return items
-        items, _ = db_activities.fetch_page(page, limit, reverse=True, search_term=q)
+            return await cache.fetch('api:activities:page1')
+        items, _ = await db_activities.afetch_page(page, limit, reverse=True, search_term=q)
         return items
     except: return []
 
@@ -671,12 +767,8 @@ def create_activity(request):
     if not data.get('title') or not data.get('date'):
         return Response('{"error": "活动主题和时间为必填项"}', 400, {'Content-Type': 'application/json'})
     
-    data['id'] = db_activities.get_max_id() + 1
+    data['id'] = db_activities.next_id()
     db_activities.append(data)
-    year = data.get('date', '')[:4]
-    invalidate_api_cache('api:activities:page1', 'api:system:stats')
-    if year:
-        cache.invalidate('api:weekly:{}'.format(year))
     return data
 
 @api_route('/api/activities/update', methods=['POST'])
@@ -696,8 +788,6 @@ def update_activity(request):
             if k in data: r[k] = data[k]
             
     if db_activities.update(data.get('id'), updater):
-        invalidate_api_cache('api:activities:page1')
-        _invalidate_weekly_cache()
         return {"status": "success"}
     return Response("Not Found", 404)
 
@@ -706,15 +796,13 @@ def update_activity(request):
 def delete_activity(request):
     pid = request.json.get('id')
     if db_activities.delete(pid):
-        invalidate_api_cache('api:activities:page1', 'api:system:stats')
-        _invalidate_weekly_cache()
         return {"status": "success"}
     return Response("Not Found", 404)
 
 # --- Tasks API ---
 @api_route('/api/tasks', methods=['GET'])
 @require_login
-def list_tasks(request):
+async def list_tasks(request):
     """获取任务列表，支持分页和搜索"""
     try:
         page = int(request.args.get('page', 1))
@@ -724,13 +812,8 @@ def list_tasks(request):
             q = simple_unquote(q)
         # 默认第一页且无搜索：走缓存
         if page == 1 and limit == 10 and not q:
-            cached = cache.get_val('api:tasks:page1')
-            if cached is not None:
-                return cached
-            items, _ = db_tasks.fetch_page(1, 10, reverse=True)
-            cache.set_val('api:tasks:page1', items)
-            return items
-        items, _ = db_tasks.fetch_page(page, limit, reverse=True, search_term=q)
+            return await cache.fetch('api:tasks:page1')
+        items, _ = await db_tasks.afetch_page(page, limit, reverse=True, search_term=q)
         return items
     except Exception as e:
         error(f"获取任务列表失败: {e}", "API")
@@ -758,7 +841,7 @@ def create_task(request):
         claimed_at = get_current_time()
     
     task = {
-        'id': db_tasks.get_max_id() + 1,
+        'id': db_tasks.next_id(),
         'title': data.get('title', ''),
         'description': data.get('description', ''),
         'reward': int(data.get('reward', 0)),
@@ -773,7 +856,6 @@ def create_task(request):
         'completed_at': None
     }
     db_tasks.append(task)
-    invalidate_api_cache('api:tasks:page1', 'api:system:stats')
     return task
 
 @api_route('/api/tasks/update', methods=['POST'])
@@ -804,7 +886,6 @@ def update_task(request):
     db_tasks.update(tid, task_updater)
     
     if updated:
-        invalidate_api_cache('api:tasks:page1')
         return {'success': True}
     return Response('{"error": "任务不存在"}', 404, {'Content-Type': 'application/json'})
 
@@ -831,7 +912,6 @@ def claim_task(request):
     db_tasks.update(tid, task_updater)
     
     if not task_found: return Response('Task not available', 404)
-    invalidate_api_cache('api:tasks:page1')
     return {"status": "success"}
 
 @api_route('/api/tasks/unclaim', methods=['POST'])
@@ -860,7 +940,6 @@ def unclaim_task(request):
         t['claimed_at'] = None
             
     db_tasks.update(tid, task_updater)
-    invalidate_api_cache('api:tasks:page1')
     return {"status": "success"}
 
 @api_route('/api/tasks/submit', methods=['POST'])
@@ -887,7 +966,6 @@ def submit_task(request):
         t['submitted_at'] = get_current_time()
             
     db_tasks.update(tid, task_updater)
-    invalidate_api_cache('api:tasks:page1')
     return {"status": "success"}
 
 @api_route('/api/tasks/approve', methods=['POST'])
@@ -941,7 +1019,6 @@ def approve_task(request):
         db_members.update(assignee_id, member_updater)
         record_points_change(assignee_id, assignee_name or '', reward, '完成任务')
     
-    invalidate_api_cache('api:tasks:page1', 'api:members:page1', 'api:points:ranking')
     return {"status": "success", "gained": reward}
 
 @api_route('/api/tasks/reject', methods=['POST'])
@@ -963,7 +1040,6 @@ def reject_task(request):
     db_tasks.update(tid, task_updater)
     
     if not task_found: return Response('Task not found', 404)
-    invalidate_api_cache('api:tasks:page1')
     return {"status": "success"}
 
 @api_route('/api/tasks/delete', methods=['POST'])
@@ -973,13 +1049,20 @@ def delete_task(request):
     data = request.json
     tid = data.get('task_id')
     if db_tasks.delete(tid):
-        invalidate_api_cache('api:tasks:page1', 'api:system:stats')
         return {"status": "success"}
     return Response("Error", 500)
 
 # --- Members API ---
+def _public_member(m):
+    """成员公开信息（雅号、围炉值）"""
+    return {'id': m.get('id'), 'alias': m.get('alias', ''), 'points': m.get('points', 0)}
+
+def _strip_password(m):
+    m.pop('password', None)
+    return m
+
 @api_route('/api/members', methods=['GET'])
-def list_members(request):
+async def list_members(request):
     """获取成员列表，支持分页和搜索
     参数 public=1 时返回公开信息（雅号、围炉值），用于未登录访问
     非公开模式需要登录，且不返回password字段
@@ -1001,29 +1084,20 @@ def list_members(request):
         if page > 0 and limit > 0:
             # 非公开模式、第一页默认参数且无搜索：走缓存
             if not public_mode and page == 1 and limit == 10 and not q:
-                cached = cache.get_val('api:members:page1')
-                if cached is not None:
-                    return cached
-                items, _ = db_members.fetch_page(1, 10, reverse=False)
-                for m in items:
-                    m.pop('password', None)
-                cache.set_val('api:members:page1', items)
-                return items
-            items, total = db_members.fetch_page(page, limit, reverse=False, search_term=q)
+                return await cache.fetch('api:members:page1')
+            items, total = await db_members.afetch_page(page, limit, reverse=False, search_term=q)
             if public_mode:
-                items = [{'id': m.get('id'), 'alias': m.get('alias', ''), 'points': m.get('points', 0)} for m in items]
+                items = [_public_member(m) for m in items]
             else:
                 for m in items:
                     m.pop('password', None)
             return items
         else:
             # 不带分页参数时返回全部数据（用于成员名称缓存）
-            members = db_members.get_all()
+            # 流式逐条输出（分块编码），内存占用与成员数量无关
             if public_mode:
-                return [{'id': m.get('id'), 'alias': m.get('alias', ''), 'points': m.get('points', 0)} for m in members]
-            for m in members:
-                m.pop('password', None)
-            return members
+                return stream_json_array(db_members.aiter_records(), _public_member)
+            return stream_json_array(db_members.aiter_records(), _strip_password)
     except Exception as e:
         error(f"获取成员列表失败: {e}", "API")
         return []
@@ -1082,19 +1156,16 @@ def create_member(request):
     if not allowed:
         return Response(json.dumps({"error": role_err}), 400, {'Content-Type': 'application/json'})
     
-    # 手机号唯一性检查
-    existing = db_members.get_all()
-    for m in existing:
-        if m.get('phone') == data.get('phone'):
-            return Response('{"error": "该手机号已被注册"}', 400, {'Content-Type': 'application/json'})
+    # 手机号唯一性检查（原始行快速匹配，避免全量加载）
+    if db_members.find_one('phone', data.get('phone')):
+        return Response('{"error": "该手机号已被注册"}', 400, {'Content-Type': 'application/json'})
     
     # 对密码进行哈希处理
     if 'password' in data and data['password']:
         data['password'] = hash_password(data['password'])
             
-    data['id'] = db_members.get_max_id() + 1
+    data['id'] = db_members.next_id()
     db_members.append(data)
-    invalidate_api_cache('api:members:page1', 'api:system:stats')
     return data
 
 @api_route('/api/members/update', methods=['POST'])
@@ -1195,15 +1266,9 @@ def update_member_route(request):
             if k in data: m[k] = data[k]
     
     if db_members.update(mid, updater):
-        # 角色可能变更，清除该用户角色缓存
-        if 'role' in data:
-            invalidate_role_cache(mid)
         # 如果积分有变动，记录日志
         if points_change != 0 and member_name:
             record_points_change(mid, member_name, points_change, '管理员调整')
-        invalidate_api_cache('api:members:page1')
-        if points_change != 0:
-            invalidate_api_cache('api:points:ranking')
         return {"status": "success"}
     return Response("Not Found", 404)
 
@@ -1282,18 +1347,16 @@ def delete_member_route(request):
         return Response(json.dumps({"error": err}), 403, {'Content-Type': 'application/json'})
     
     if db_members.delete(member_id):
-        invalidate_role_cache(member_id)
-        invalidate_api_cache('api:members:page1', 'api:system:stats')
         return {"status": "success"}
     return Response("Error", 500)
 
 @api_route('/api/points/yearly_ranking', methods=['GET'])
-def yearly_points_ranking(request):
+async def yearly_points_ranking(request):
     """获取年度积分排行榜（最近1年新增积分）"""
-    # 缓存检查
-    cached = cache.get_val('api:points:ranking')
-    if cached is not None:
-        return cached
+    return await cache.fetch('api:points:ranking')
+
+async def _load_points_ranking():
+    """汇总最近1年的积分日志，返回前10名"""
     # 计算1年前的时间戳
     t = time.localtime()
     one_year_ago = "{:04d}-{:02d}-{:02d}T00:00:00".format(
@@ -1302,7 +1365,7 @@ def yearly_points_ranking(request):
     
     # 统计每个成员最近1年的积分变动（流式处理，不加载全部日志）
     member_yearly_points = {}
-    for log in db_points_logs.iter_records():
+    async for log in db_points_logs.aiter_records():
         ts = log.get('timestamp', '')
         if ts >= one_year_ago:
             mid = log.get('member_id')
@@ -1329,9 +1392,11 @@ def yearly_points_ranking(request):
     _check_low_memory()
     
     # 返回前10名
-    result = ranking[:10]
-    cache.set_val('api:points:ranking', result)
-    return result
+    return ranking[:10]
+
+# 年度排行：积分日志汇总 + 成员雅号；swr 模式，过期后先返回旧排行，后台重新汇总
+cache.register('api:points:ranking', ctype='value', ttl=300, depends=('points_logs', 'members'),
+               loader=_load_points_ranking, swr=True)
 
 @api_route('/api/check-token', methods=['GET'])
 def check_token_route(request):
@@ -1352,36 +1417,32 @@ def login_route(request):
         return Response('{"error": "手机号和密码为必填项"}', 400, {'Content-Type': 'application/json'})
     
     try:
-        with open(db_members.filepath, 'r') as f:
-            for line in f:
-                try:
-                    m = json.loads(line)
-                    if m.get('phone') == p and verify_password(pw, m.get('password', '')):
-                        # 检查网站访问状态：未开放时只允许管理员登录
-                        s = get_settings()
-                        if not s.get('site_open', True):
-                            role = m.get('role', 'member')
-                            if role not in ['super_admin', 'admin']:
-                                record_login_log(m.get('id'), m.get('name', '未知'), p, 'failed', request.client_ip)
-                                return Response('{"error": "系统维护中，仅管理员可登录"}', 503, {'Content-Type': 'application/json'})
-                        
-                        m_safe = {
-                            'id': m.get('id'),
-                            'name': m.get('name', ''),
-                            'phone': m.get('phone', ''),
-                            'alias': m.get('alias', ''),
-                            'role': m.get('role', 'member'),
-                            'birthday': m.get('birthday', ''),
-                        }
-                        # 生成登录Token
-                        token, expires_in = generate_token(m.get('id'))
-                        m_safe['token'] = token
-                        m_safe['expires_in'] = expires_in  # 有效期秒数，前端自行计算过期时间
-                        # 记录登录成功日志
-                        record_login_log(m.get('id'), m.get('name', '未知'), p, 'success', request.client_ip)
-                        return m_safe
-                except Exception as e:
-                    debug(f"解析用户记录失败: {e}", "Login")
+        # 按手机号查找（原始行快速匹配，只解析候选记录）
+        m = db_members.find_one('phone', p)
+        if m and m.get('phone') == p and verify_password(pw, m.get('password', '')):
+            # 检查网站访问状态：未开放时只允许管理员登录
+            s = get_settings()
+            if not s.get('site_open', True):
+                role = m.get('role', 'member')
+                if role not in ['super_admin', 'admin']:
+                    record_login_log(m.get('id'), m.get('name', '未知'), p, 'failed', request.client_ip)
+                    return Response('{"error": "系统维护中，仅管理员可登录"}', 503, {'Content-Type': 'application/json'})
+            
+            m_safe = {
+                'id': m.get('id'),
+                'name': m.get('name', ''),
+                'phone': m.get('phone', ''),
+                'alias': m.get('alias', ''),
+                'role': m.get('role', 'member'),
+                'birthday': m.get('birthday', ''),
+            }
+            # 生成登录Token
+            token, expires_in = generate_token(m.get('id'))
+            m_safe['token'] = token
+            m_safe['expires_in'] = expires_in  # 有效期秒数，前端自行计算过期时间
+            # 记录登录成功日志
+            record_login_log(m.get('id'), m.get('name', '未知'), p, 'success', request.client_ip)
+            return m_safe
     except Exception as e:
         debug(f"读取用户文件失败: {e}", "Login")
     
@@ -1516,6 +1577,7 @@ def _rewrite_finance_file(update_id=None, update_data=None, delete_id=None):
         if not need_target or found:
             os.remove('data/finance.jsonl')
             os.rename(tmp, 'data/finance.jsonl')
+            db_finance.invalidate_cache()
         else:
             os.remove(tmp)
         gc.collect()
@@ -1530,19 +1592,14 @@ def _rewrite_finance_file(update_id=None, update_data=None, delete_id=None):
 
 @api_route('/api/finance', methods=['GET'])
 @require_login
-def list_finance(request):
+async def list_finance(request):
     """获取财务记录列表（需要登录），支持分页"""
     try:
         page = int(request.args.get('page', 1))
         limit = int(request.args.get('limit', 20))
         # 默认第一页：走缓存
         if page == 1 and limit == 20:
-            cached = cache.get_val('api:finance:page1')
-            if cached is not None:
-                return cached
-            items, _ = db_finance.fetch_page(1, 20, reverse=True)
-            cache.set_val('api:finance:page1', items)
-            return items
+            return await cache.fetch('api:finance:page1')
         items, _ = db_finance.fetch_page(page, limit, reverse=True)
         return items
     except Exception as e:
@@ -1551,21 +1608,26 @@ def list_finance(request):
 
 @api_route('/api/finance/stats', methods=['GET'])
 @require_login
-def finance_stats(request):
-    """获取财务统计：本年度收支 + 全时段累计余额
+async def finance_stats(request):
+    """获取财务统计：本年度收支 + 全时段累计余额"""
+    return await cache.fetch('api:finance:stats')
+
+async def _load_finance_stats():
+    """
     单次文件扫描，年份预过滤减少JSON解析，最后一行获取余额
+    按 Pacer 节拍让出事件循环；扫描期间财务表变更时缓存槽已失效，结果不会被缓存
     """
-    # 缓存检查
-    cached = cache.get_val('api:finance:stats')
-    if cached is not None:
-        return cached
     year_str = str(time.localtime()[0])
     year_income = 0
     year_expense = 0
     last_line = ''
+    pacer = Pacer()
     try:
         with open('data/finance.jsonl', 'r') as f:
             for line in f:
+                if pacer.due():
+                    await asyncio.sleep(0)
+                    pacer.restart()
                 line_s = line.strip()
                 if not line_s:
                     continue
@@ -1598,9 +1660,11 @@ def finance_stats(request):
                 balance = _get_last_balance()
         except:
             balance = _get_last_balance()
-    result = {"year_income": year_income, "year_expense": year_expense, "balance": balance, "year": int(year_str)}
-    cache.set_val('api:finance:stats', result)
-    return result
+    return {"year_income": year_income, "year_expense": year_expense, "balance": balance, "year": int(year_str)}
+
+# 财务统计：swr 模式，过期后先返回旧统计，后台重新扫描
+cache.register('api:finance:stats', ctype='value', ttl=300, depends='finance',
+               loader=_load_finance_stats, swr=True)
 
 @api_route('/api/finance', methods=['POST'])
 @require_permission(ROLE_FINANCE)
@@ -1621,7 +1685,7 @@ def add_finance(request):
         return Response('{"error": "金额必须为有效数字"}', 400, {'Content-Type': 'application/json'})
     data['amount'] = amount
     
-    data['id'] = db_finance.get_max_id() + 1
+    data['id'] = db_finance.next_id()
     # 计算并存储操作后余额
     last_balance = _get_last_balance()
     if data.get('type') == 'income':
@@ -1629,7 +1693,6 @@ def add_finance(request):
     else:
         data['balance_after'] = last_balance - data['amount']
     db_finance.append(data)
-    invalidate_api_cache('api:finance:page1', 'api:finance:stats', 'api:system:stats')
     return data
 
 @api_route('/api/finance/update', methods=['POST'])
@@ -1656,7 +1719,6 @@ def update_finance(request):
     
     fid = data.get('id')
     if _rewrite_finance_file(update_id=fid, update_data=data):
-        invalidate_api_cache('api:finance:page1', 'api:finance:stats')
         return {"status": "success"}
     return Response('{"error": "记录不存在"}', 404, {'Content-Type': 'application/json'})
 
@@ -1670,7 +1732,6 @@ def delete_finance(request):
     
     fid = data.get('id')
     if _rewrite_finance_file(delete_id=fid):
-        invalidate_api_cache('api:finance:page1', 'api:finance:stats', 'api:system:stats')
         return {"status": "success"}
     return Response('{"error": "记录不存在"}', 404, {'Content-Type': 'application/json'})
 
@@ -2047,25 +2108,29 @@ def sys_info(request):
 
 @api_route('/api/system/stats')
 @require_login
-def sys_stats(request):
+async def sys_stats(request):
     """获取各模块数据统计（登录用户可查看）"""
     try:
-        cached = cache.get_val('api:system:stats')
-        if cached is not None:
-            return cached
-        result = {
-            "members": db_members.count(),
-            "poems": db_poems.count(),
-            "activities": db_activities.count(),
-            "tasks": db_tasks.count(),
-            "finance": db_finance.count()
-        }
-        cache.set_val('api:system:stats', result)
-        return result
+        return await cache.fetch('api:system:stats')
     except Exception as e:
         error(f"获取统计数据失败: {e}", "Stats")
         return {}
 
+async def _load_system_stats():
+    """各表记录数（行偏移索引或计数缓存已建立时不读文件）"""
+    return {
+        "members": db_members.count(),
+        "poems": db_poems.count(),
+        "activities": db_activities.count(),
+        "tasks": db_tasks.count(),
+        "finance": db_finance.count()
+    }
+
+# 各表记录数：仅新增/删除时失效
+cache.register('api:system:stats', ctype='value', ttl=300,
+               depends={t: _count_changed for t in ('members', 'poems', 'activities', 'tasks', 'finance')},
+               loader=_load_system_stats)
+
 # --- 分表备份API（支持大数据量） ---
 # 数据表映射
 BACKUP_TABLES = {
@@ -2080,7 +2145,7 @@ BACKUP_TABLES = {
 
 @api_route('/api/backup/export-table')
 @require_permission(ROLE_SUPER_ADMIN)
-def backup_export_table(request):
+async def backup_export_table(request):
     """分表导出（管理员权限）
     查询参数：name=表名, page=页码(可选), limit=每页条数(可选,默认100)
     返回：{table, data, page, total, hasMore}
@@ -2101,7 +2166,7 @@ def backup_export_table(request):
     try:
         if table in BACKUP_TABLES:
             # JSONL 数据表 - 使用分页读取避免内存溢出
-            data, total = BACKUP_TABLES[table].fetch_page(page=page, limit=limit, reverse=False)
+            data, total = await BACKUP_TABLES[table].afetch_page(page=page, limit=limit, reverse=False)
             gc.collect()
             has_more = (page * limit) < total
             return {"table": table, "data": data, "page": page, "total": total, "hasMore": has_more}
@@ -2143,11 +2208,57 @@ def backup_export_table(request):
         error(f"分表导出失败 [{table}]: {e}", "Backup")
         return Response(f'{{"error": "导出失败: {str(e)}"}}', 500, {'Content-Type': 'application/json'})
 
-@api_route('/api/backup/import-table', methods=['POST'])
+async def _import_jsonl_table(request, table, mode):
+    """
+    逐条流式导入 JSONL 数据表：请求体边到达边解析，每条记录立即写入临时文件，
+    全部成功后再替换（覆盖模式）或追加到目标表，解析失败时原表不受影响
+    返回导入的记录数，请求体中没有数据数组、或覆盖模式下没有任何记录时返回 None；格式错误抛出 ValueError，
+    请求体不完整抛出 OSError；任何情况下临时文件都会被删除
+    """
+    ndjson = 'ndjson' in request.headers.get('content-type', '')
+    records = JsonRecordStream(request.stream, ndjson=ndjson)
+    filepath = f'data/{table}.jsonl'
+    # 每表独立的临时文件，不同表的导入可并发进行（.tmp 后缀，异常残留时启动清理）
+    tmp_path = filepath + '.import.tmp'
+    try:
+        with open(tmp_path, 'w') as f:
+            async for item in records:
+                f.write(json.dumps(item))
+                f.write("\n")
+                if records.count % 50 == 0:
+                    watchdog.feed()
+        if not records.found:
+            return None
+        if mode == 'overwrite' and records.count == 0:
+            # 空请求体（NDJSON 下即空白内容）不能清空整表
+            return None
+        if mode == 'overwrite':
+            try:
+                os.remove(filepath)
+            except OSError:
+                pass
+            os.rename(tmp_path, filepath)
+        else:
+            with open(tmp_path, 'rb') as f_in, open(filepath, 'ab') as f_out:
+                while True:
+                    block = f_in.read(2048)
+                    if not block:
+                        break
+                    f_out.write(block)
+    finally:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+    return records.count
+
+@api_route('/api/backup/import-table', methods=['POST'], stream=True)
 @require_permission(ROLE_SUPER_ADMIN)
-def backup_import_table(request):
+async def backup_import_table(request):
     """分表导入（管理员权限）
-    查询参数：name=表名
+    查询参数：name=表名, mode=overwrite|append
+    数据表请求体为 {"data": [...]}、顶层数组或 NDJSON（Content-Type: application/x-ndjson），
+    以流式逐条解析写入，内存占用与请求体大小无关；配置类表的请求体较小，读完后整体解析
     """
     # 获取表名
     table = request.args.get('name', '')
@@ -2161,46 +2272,52 @@ def backup_import_table(request):
     _check_low_memory()
     
     try:
-        data = request.json
-        # 如果 request.json 为空，尝试手动解析（大请求体跳过了自动解析）
-        if not data and request.body:
+        # 获取导入模式：overwrite(覆盖,默认) 或 append(追加,用于分批导入)
+        mode = request.args.get('mode', 'overwrite')
+        
+        if table in BACKUP_TABLES:
+            # JSONL 数据表 - 流式逐条写入
+            info(f"分表导入 [{table}]: 开始处理, 模式={mode}", "Backup")
             try:
-                # 确保是字符串类型（MicroPython的json.loads可能不支持bytes）
-                body_str = request.body
-                if isinstance(body_str, bytes):
-                    body_str = body_str.decode('utf-8')
-                data = json.loads(body_str)
-            except Exception as parse_err:
+                count = await _import_jsonl_table(request, table, mode)
+            except ValueError as parse_err:
                 error(f"分表导入 [{table}]: JSON解析失败 - {parse_err}", "Backup")
                 return Response('{"error": "JSON解析失败"}', 400, {'Content-Type': 'application/json'})
+            except OSError as io_err:
+                # 上传中断或请求体不完整（临时文件已由 _import_jsonl_table 清理，原表不受影响）
+                error(f"分表导入 [{table}]: 请求体不完整 - {io_err}", "Backup")
+                return Response('{"error": "上传中断，请求体不完整"}', 400, {'Content-Type': 'application/json'})
+            if count is None:
+                error(f"分表导入 [{table}]: 缺少data字段或没有可导入的记录", "Backup")
+                return Response('{"error": "缺少数据内容"}', 400, {'Content-Type': 'application/json'})
+            gc.collect()
+            watchdog.feed()
+            # 文件已被直接重写：清除该表的计数/最大ID/记录缓存，依赖该表的 API 缓存随之失效
+            BACKUP_TABLES[table].invalidate_cache()
+            info(f"分表导入 [{table}]: 成功写入 {count} 条记录", "Backup")
+            return {"status": "success", "table": table, "count": count}
+        
+        if request.content_length() > app.max_body_size:
+            return Response('{"error": "请求体过大"}', 413, {'Content-Type': 'application/json'})
+        data = None
+        try:
+            chunks = []
+            async for chunk in request.stream:
+                chunks.append(chunk)
+            if request.stream.truncated:
+                raise ValueError('request body truncated')
+            data = json.loads(b''.join(chunks))
+        except Exception as parse_err:
+            error(f"分表导入 [{table}]: JSON解析失败 - {parse_err}", "Backup")
+            return Response('{"error": "JSON解析失败"}', 400, {'Content-Type': 'application/json'})
         
         if not data or 'data' not in data:
-            error(f"分表导入 [{table}]: 缺少data字段", "Backup")
+            error(f"分表导入 [{table}]: 缺少data字段或没有可导入的记录", "Backup")
             return Response('{"error": "缺少数据内容"}', 400, {'Content-Type': 'application/json'})
         
         table_data = data['data']
-        # 获取导入模式：overwrite(覆盖,默认) 或 append(追加,用于分批导入)
-        mode = request.args.get('mode', 'overwrite')
-        info(f"分表导入 [{table}]: 开始处理, 记录数={len(table_data) if isinstance(table_data, list) else 'N/A'}, 模式={mode}", "Backup")
         
-        if table in BACKUP_TABLES:
-            # JSONL 数据表 - 根据模式选择写入方式
-            filepath = f'data/{table}.jsonl'
-            file_mode = 'w' if mode == 'overwrite' else 'a'
-            with open(filepath, file_mode) as f:
-                for item in table_data:
-                    f.write(json.dumps(item) + "\n")
-            gc.collect()
-            watchdog.feed()
-            # members表导入后清除角色缓存
-            if table == 'members':
-                invalidate_role_cache()
-            # 清除对应模块的 API 缓存
-            invalidate_module_cache(table)
-            info(f"分表导入 [{table}]: 成功写入 {len(table_data)} 条记录", "Backup")
-            return {"status": "success", "table": table, "count": len(table_data)}
-        
-        elif table == 'settings':
+        if table == 'settings':
             # 从配置文件读取完整的配置
             with open('data/config.json', 'r') as f:
                 config = json.load(f)
@@ -2274,12 +2391,13 @@ def get_chat_guest_max():
     return s.get('chat_guest_max', 10)
 
 # 聊天室内存缓存数据结构（注册到缓存管理器）
-cache.register('chat:messages', ctype='list')       # 消息列表: [{id, user_id, user_name, content, timestamp}, ...]
-cache.register('chat:users', ctype='dict')           # 在线用户: {user_id: user_name, ...}
-cache.register('chat:guests', ctype='dict')          # 游客映射: {guest_id: {'name': ..., 'expire': timestamp}, ...}
-cache.register('chat:size', ctype='value', initial=0)      # 当前消息占用字节数
-cache.register('chat:msg_id', ctype='value', initial=0)    # 消息ID计数器
-cache.register('chat:msg_count', ctype='dict')       # 每用户消息计数: {user_id: count}
+# 聊天室数据是运行状态而非缓存，不参与内存预算淘汰（PINNED）
+cache.register('chat:messages', ctype='list', priority=PRIORITY_PINNED)       # 消息列表: [{id, user_id, user_name, content, timestamp}, ...]
+cache.register('chat:users', ctype='dict', priority=PRIORITY_PINNED)           # 在线用户: {user_id: user_name, ...}
+cache.register('chat:guests', ctype='dict', priority=PRIORITY_PINNED)          # 游客映射: {guest_id: {'name': ..., 'expire': timestamp}, ...}
+cache.register('chat:size', ctype='value', initial=0, priority=PRIORITY_PINNED)      # 当前消息占用字节数
+cache.register('chat:msg_id', ctype='value', initial=0, priority=PRIORITY_PINNED)    # 消息ID计数器
+cache.register('chat:msg_count', ctype='dict', priority=PRIORITY_PINNED)       # 每用户消息计数: {user_id: count}
 
 def _estimate_msg_size(msg):
     """估算单条消息占用的内存大小"""
@@ -2579,6 +2697,9 @@ def api_cache_stats(request):
     # 补充聊天室内存用量（stats只返回条目数，不含字节数）
     stats['chat_size_bytes'] = cache.get_val('chat:size')
     stats['chat_size_limit'] = get_chat_max_size()
+    stats['cache_bytes'] = cache.total_bytes()
+    stats['cache_budget'] = cache.budget()
+    stats['warmup'] = _warmup
     stats['memory_free'] = gc.mem_free()
     try:
         stats['memory_total'] = gc.mem_free() + gc.mem_alloc()
@@ -2587,6 +2708,59 @@ def api_cache_stats(request):
     gc.collect()
     return stats
 
+# --- 启动预热 ---
+# 重启（含看门狗复位）后在后台依次建立索引与接口缓存，首批访问者无需等待冷启动扫描
+# 进度：state 为 pending/running/done/aborted（内存不足时中止），done/total 为已完成/总步骤数
+_warmup = {'state': 'pending', 'step': None, 'done': 0, 'total': 0, 'ms': 0}
+
+def _warmup_steps():
+    """
+    预热步骤 [(名称, 函数)]，按缓存优先级从高到低：
+    系统设置 → 各表行偏移索引/记录数/最大ID → 带加载函数的接口缓存 → 每日一诗
+    """
+    def daily_poem():
+        total = db_poems.count()
+        if total:
+            _poem_of_the_day(total)
+    steps = [('settings', get_settings)]
+    for db in (db_members, db_poems, db_activities, db_tasks, db_finance):
+        steps.append((db.table, db.awarm))
+    # 当年周统计按年份动态注册，先注册才能被 loaders() 列出
+    _weekly_cache(time.localtime()[0])
+    for name in cache.loaders():
+        steps.append((name, lambda n=name: cache.fetch(n)))
+    steps.append(('api:poems:daily', daily_poem))
+    return steps
+
+@app.on_startup
+async def _warm_caches():
+    """启动预热任务：每步之间让出事件循环并喂狗，请求优先得到处理；单步失败不影响后续步骤"""
+    steps = _warmup_steps()
+    _warmup['state'] = 'running'
+    _warmup['total'] = len(steps)
+    start = time.ticks_ms()
+    for name, fn in steps:
+        _warmup['step'] = name
+        try:
+            res = fn()
+            if hasattr(res, 'send'):
+                await res
+        except Exception as e:
+            warn(f"预热 {name} 失败: {e}", "Cache")
+        _warmup['done'] += 1
+        watchdog.feed()
+        gc.collect()
+        if gc.mem_free() < LOW_MEMORY_THRESHOLD:
+            _warmup['state'] = 'aborted'
+            warn(f"内存不足({gc.mem_free()}B)，预热中止于 {name}", "Cache")
+            break
+        await asyncio.sleep(0)
+    else:
+        _warmup['state'] = 'done'
+    _warmup['step'] = None
+    _warmup['ms'] = time.ticks_diff(time.ticks_ms(), start)
+    info(f"缓存预热{'完成' if _warmup['state'] == 'done' else '中止'}：{_warmup['done']}/{_warmup['total']} 步，耗时 {_warmup['ms']}ms", "Cache")
+
 if __name__ == '__main__':
     try:
         info("正在启动 Microdot Web服务...", "System")
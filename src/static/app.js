@@ -4092,6 +4092,9 @@ async function loadCacheStats() {
         const memTotal = data.memory_total || 0;
         const chatSizeBytes = data.chat_size_bytes || 0;
         const chatSizeLimit = data.chat_size_limit || 0;
+        const cacheBytes = data.cache_bytes || 0;
+        const cacheBudget = data.cache_budget || 0;
+        const warmup = data.warmup || null;
 
         // 收集缓存槽统计
         const slots = [];
@@ -4130,7 +4133,7 @@ async function loadCacheStats() {
 
         const typeLabels = { dict: '字典', list: '列表', value: '单值', const: '常量' };
         const header = `<div class="cache-table-header">
-            <div>缓存名称</div><div>类型</div><div>条目</div><div>命中率</div><div>TTL</div><div>过期</div>
+            <div>缓存名称</div><div>类型</div><div>条目</div><div>内存</div><div>命中率</div><div>TTL</div><div>过期</div>
         </div>`;
         const rows = slots.map(s => {
             const total = s.hits + s.misses;
@@ -4142,6 +4145,7 @@ async function loadCacheStats() {
                 <div class="cache-name" data-label="名称">${s.name}</div>
                 <div data-label="类型"><span class="cache-type-badge cache-type-${s.type}">${typeLabel}</span></div>
                 <div data-label="条目">${s.size}</div>
+                <div data-label="内存">${formatBytes(s.bytes)}</div>
                 <div data-label="命中率">${rate}</div>
                 <div data-label="TTL">${ttl}</div>
                 <div data-label="过期">${expires}</div>
@@ -4154,6 +4158,16 @@ async function loadCacheStats() {
             const chatPct = Math.round(chatSizeBytes / chatSizeLimit * 100);
             chatInfo = `<div class="cache-chat-memory">聊天内存: ${formatBytes(chatSizeBytes)} / ${formatBytes(chatSizeLimit)} (${chatPct}%)</div>`;
         }
+        if(cacheBudget > 0) {
+            const budgetPct = Math.round(cacheBytes / cacheBudget * 100);
+            chatInfo += `<div class="cache-chat-memory">缓存预算: ${formatBytes(cacheBytes)} / ${formatBytes(cacheBudget)} (${budgetPct}%)</div>`;
+        }
+        if(warmup && warmup.total > 0) {
+            const warmupLabels = { pending: '等待中', running: '进行中', done: '已完成', aborted: '已中止' };
+            const step = warmup.step ? `，当前: ${warmup.step}` : '';
+            const elapsed = warmup.state === 'running' ? '' : `，耗时 ${warmup.ms}ms`;
+            chatInfo += `<div class="cache-chat-memory">启动预热: ${warmupLabels[warmup.state] || warmup.state} ${warmup.done}/${warmup.total}${step}${elapsed}</div>`;
+        }
 
         container.innerHTML = `<div class="cache-table">${header}${rows}</div>${chatInfo}`;
     } catch(e) {
@@ -0,0 +1,59 @@
+# HTTP 吞吐基准测试（在电脑上运行，测试设备上的 Web 服务）
+# 通过长连接重复请求同一地址，统计请求速率与传输吞吐，用于比较固件/代码修改前后的差异
+#
+# 用法：
+#   python tools/bench_http.py http://192.168.1.68/static/app.js
+#   python tools/bench_http.py http://192.168.1.68/static/app.js -n 50 --gzip
+#   python tools/bench_http.py http://192.168.1.68/api/poems/random -n 100 --new-conn
+
+import argparse
+import http.client
+import time
+from urllib.parse import urlsplit
+
+
+def run(url, n, gzip=False, new_conn=False):
+    u = urlsplit(url)
+    path = (u.path or '/') + ('?' + u.query if u.query else '')
+    headers = {'Accept-Encoding': 'gzip'} if gzip else {}
+    conn = None
+    total_bytes = 0
+    latencies = []
+    t_start = time.perf_counter()
+    for _ in range(n):
+        if conn is None or new_conn:
+            if conn is not None:
+                conn.close()
+            conn = http.client.HTTPConnection(u.hostname, u.port or 80, timeout=30)
+        t0 = time.perf_counter()
+        conn.request('GET', path, headers=headers)
+        resp = conn.getresponse()
+        body = resp.read()
+        latencies.append(time.perf_counter() - t0)
+        if resp.status != 200:
+            print('状态码异常:', resp.status)
+        total_bytes += len(body)
+        if resp.getheader('Connection', '').lower() == 'close':
+            conn.close()
+            conn = None
+    elapsed = time.perf_counter() - t_start
+    if conn is not None:
+        conn.close()
+    latencies.sort()
+    print('请求数: {}  总耗时: {:.2f} s'.format(n, elapsed))
+    print('请求速率: {:.1f} req/s'.format(n / elapsed))
+    print('吞吐: {:.1f} KB/s（消息体共 {} 字节）'.format(total_bytes / 1024 / elapsed, total_bytes))
+    print('延迟: 中位 {:.1f} ms  P90 {:.1f} ms  最大 {:.1f} ms'.format(
+        latencies[len(latencies) // 2] * 1000,
+        latencies[int(len(latencies) * 0.9)] * 1000,
+        latencies[-1] * 1000))
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description='设备 HTTP 吞吐基准测试')
+    ap.add_argument('url')
+    ap.add_argument('-n', type=int, default=20, help='请求次数')
+    ap.add_argument('--gzip', action='store_true', help='声明 Accept-Encoding: gzip')
+    ap.add_argument('--new-conn', action='store_true', help='每个请求新建连接（不复用长连接）')
+    args = ap.parse_args()
+    run(args.url, args.n, args.gzip, args.new_conn)
@@ -0,0 +1,100 @@
+# JsonlDB 扫描基准测试
+# 对比逐行读取（for line in f + strip/lower）与块扫描器（LineScanner）的
+# 堆分配量、耗时与 GC 耗时
+#
+# 用法：
+#   设备（已部署 src/ 内容，数据位于 data/）：
+#     mpremote run tools/bench_jsonldb.py
+#     输出：耗时、堆分配总量（关闭 GC 时 gc.mem_alloc 的增量）、GC 耗时（开/关 GC 两次耗时之差）
+#   电脑（CPython，在 src/ 目录下运行）：
+#     cd src && python ../tools/bench_jsonldb.py
+#     输出：耗时（多次取最快）、峰值内存（tracemalloc）；
+#     CPython 按引用计数立即释放对象，没有与设备对应的堆分配总量与 GC 耗时，这两项只能在设备上测得
+# 可修改下方 TABLE / NEEDLES 选择测试的表和搜索词
+
+import gc
+import sys
+import time
+
+MICROPYTHON = sys.implementation.name == 'micropython'
+if not MICROPYTHON:
+    # 电脑端：JsonlDB 依赖 uasyncio，以标准库 asyncio 代替；脚本所在目录之外的 src/ 需在搜索路径中
+    import asyncio
+    sys.modules.setdefault('uasyncio', asyncio)
+    sys.path.insert(0, '.')
+
+from lib.JsonlDB import LineScanner
+
+TABLE = 'data/poems.jsonl'
+NEEDLES = ('abc', '春')
+REPEAT = 20     # 电脑端重复次数（取最快值）
+
+
+def legacy_scan(path, needle):
+    """旧实现：每行分配 str，搜索时再复制 strip/lower"""
+    n = 0
+    with open(path, 'r') as f:
+        for line in f:
+            if not line.strip(): continue
+            if needle in line.lower():
+                n += 1
+    return n
+
+
+def scanner_scan(path, needle):
+    """新实现：按块读取，行不复制"""
+    n = 0
+    b = needle.encode()
+    fold = b.upper() != b
+    with open(path, 'rb') as f:
+        sc = LineScanner(f)
+        while sc.next():
+            if sc.contains(b, fold):
+                n += 1
+    return n
+
+
+def measure_device(fn, needle):
+    # 关闭 GC 统计堆分配总量（堆变动）
+    gc.collect()
+    gc.disable()
+    a0 = gc.mem_alloc()
+    t0 = time.ticks_ms()
+    hits = fn(TABLE, needle)
+    t_nogc = time.ticks_diff(time.ticks_ms(), t0)
+    churn = gc.mem_alloc() - a0
+    gc.enable()
+    # 开启 GC 重跑，两次耗时之差近似为 GC 耗时
+    gc.collect()
+    t0 = time.ticks_ms()
+    fn(TABLE, needle)
+    t_gc = time.ticks_diff(time.ticks_ms(), t0)
+    return '命中 {} 行, 堆分配 {} 字节, 耗时 {} ms, GC 约 {} ms'.format(
+        hits, churn, t_gc, max(0, t_gc - t_nogc))
+
+
+def measure_host(fn, needle):
+    import tracemalloc
+    best = None
+    for _ in range(REPEAT):
+        t0 = time.perf_counter()
+        hits = fn(TABLE, needle)
+        t = time.perf_counter() - t0
+        best = t if best is None else min(best, t)
+    tracemalloc.start()
+    fn(TABLE, needle)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return '命中 {} 行, 耗时 {:.2f} ms（{} 次最快）, 峰值内存 {} 字节'.format(
+        hits, best * 1000, REPEAT, peak)
+
+
+def main():
+    measure = measure_device if MICROPYTHON else measure_host
+    print('运行环境:', sys.implementation.name, ' 表:', TABLE)
+    for needle in NEEDLES:
+        for name, fn in (('逐行读取', legacy_scan), ('块扫描器', scanner_scan)):
+            print('[{}] {}: {}'.format(needle, name, measure(fn, needle)))
+
+
+main()
@@ -0,0 +1,55 @@
+# HTTP 响应写出计数
+# 以计数写入器代替 socket 调用 Response.write，统计 writer.write（MicroPython 上即一次 socket 发送）与 drain 的次数，
+# 结果只取决于代码，与运行环境无关
+#
+# 用法（电脑端，在 src/ 目录下运行）：
+#   cd src && python ../tools/bench_writes.py
+# 对比修改前后：用 git worktree 检出旧版本，在其 src/ 目录下运行同一脚本
+#   git worktree add /tmp/before <旧提交> && cd /tmp/before/src && python /path/to/tools/bench_writes.py
+
+import sys
+
+if sys.implementation.name != 'micropython':
+    import asyncio
+    sys.modules.setdefault('uasyncio', asyncio)
+    sys.path.insert(0, '.')
+else:
+    import uasyncio as asyncio
+
+from lib.microdot import Response, send_file
+
+
+class CountingWriter:
+    """记录写出次数、字节数与 drain 次数"""
+
+    def __init__(self):
+        self.writes = 0
+        self.bytes = 0
+        self.drains = 0
+
+    def write(self, data):
+        self.writes += 1
+        self.bytes += len(data)
+
+    async def drain(self):
+        self.drains += 1
+
+    async def awrite(self, data):
+        self.write(data)
+
+
+CASES = (
+    ('JSON 2KB', lambda: Response('{"a": "' + 'x' * 2000 + '"}', headers={'Content-Type': 'application/json'})),
+    ('文件 static/logo.png', lambda: send_file('static/logo.png')),
+    ('文件 static/app.js', lambda: send_file('static/app.js')),
+)
+
+
+async def run():
+    for name, make in CASES:
+        w = CountingWriter()
+        await make().write(w)
+        print('{}: 写出 {} 次, drain {} 次, 共 {} 字节'.format(name, w.writes, w.drains, w.bytes))
+
+
+asyncio.run(run())
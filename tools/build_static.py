@@ -0,0 +1,90 @@
+# 静态资源构建工具（在电脑上运行）
+# 将 src/static/ 构建到 dist/static/，用于部署到设备的 static/ 目录：
+# - 为 css/js/png 计算内容哈希，生成 manifest.json（{原文件名: 哈希文件名}），
+#   并把 index.html 中的引用改写为哈希地址（如 /static/app.1a2b3c4d.js），
+#   设备按清单映射到原文件并以 immutable 长期缓存，资源未变化时浏览器不再请求
+# - 为 html/css/js 生成 .gz 副本，设备端 send_file 在客户端支持 gzip 时直接发送，
+#   减少约 70% 的首次加载传输量
+#
+# 用法：
+#   python tools/build_static.py            # 仅构建到 dist/static/
+#   python tools/build_static.py --upload   # 构建后通过 mpremote 上传到设备 static/
+#
+# 注意：源文件保持普通地址，未执行构建时设备照常工作；
+#       更新任何静态文件后需重新构建并上传（清单与 .gz 均依赖当时的文件内容）
+
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+STATIC_DIR = os.path.join(ROOT, 'src', 'static')
+DIST_DIR = os.path.join(ROOT, 'dist', 'static')
+COMPRESS_EXTS = ('.html', '.css', '.js')
+# 需要哈希地址的资源（须与 main.py 中 STATIC_ASSETS 一致）
+HASHED_EXTS = ('.css', '.js', '.png')
+
+
+def hashed_name(name, data):
+    """app.js -> app.<内容哈希前8位>.js"""
+    base, ext = os.path.splitext(name)
+    return '{}.{}{}'.format(base, hashlib.sha256(data).hexdigest()[:8], ext)
+
+
+def build():
+    """构建 dist/static/，返回需要上传的文件列表"""
+    if os.path.isdir(DIST_DIR):
+        shutil.rmtree(DIST_DIR)
+    os.makedirs(DIST_DIR)
+
+    files = {}
+    for name in sorted(os.listdir(STATIC_DIR)):
+        path = os.path.join(STATIC_DIR, name)
+        if os.path.isfile(path) and not name.endswith('.gz'):
+            with open(path, 'rb') as f:
+                files[name] = f.read()
+
+    manifest = {name: hashed_name(name, data) for name, data in files.items()
+                if name.endswith(HASHED_EXTS)}
+    if 'index.html' in files:
+        html = files['index.html'].decode('utf-8')
+        for name, hname in manifest.items():
+            html = html.replace('/static/' + name + '"', '/static/' + hname + '"')
+        files['index.html'] = html.encode('utf-8')
+    files['manifest.json'] = json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8')
+
+    for name, data in files.items():
+        with open(os.path.join(DIST_DIR, name), 'wb') as f:
+            f.write(data)
+        if not name.endswith(COMPRESS_EXTS):
+            continue
+        # mtime=0 使输出稳定，内容不变时重复构建结果一致
+        gz = gzip.compress(data, compresslevel=9, mtime=0)
+        if len(gz) >= len(data):
+            print('跳过压缩 {}（无收益）'.format(name))
+            continue
+        with open(os.path.join(DIST_DIR, name + '.gz'), 'wb') as f:
+            f.write(gz)
+        print('{}: {} -> {} 字节 ({:.0%})'.format(name, len(data), len(gz), len(gz) / len(data)))
+    for name, hname in sorted(manifest.items()):
+        print('{} -> {}'.format(name, hname))
+    return sorted(os.listdir(DIST_DIR))
+
+
+def upload(files):
+    """通过 mpremote 上传到设备 static/ 目录（.gz 最后上传，确保其修改时间不早于源文件）"""
+    files = sorted(files, key=lambda n: n.endswith('.gz'))
+    for name in files:
+        cmd = ['mpremote', 'fs', 'cp', os.path.join(DIST_DIR, name), ':static/' + name]
+        print(' '.join(cmd))
+        subprocess.run(cmd, check=True)
+
+
+if __name__ == '__main__':
+    files = build()
+    if '--upload' in sys.argv[1:]:
+        upload(files)